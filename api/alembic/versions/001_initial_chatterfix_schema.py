@@ -21,22 +21,23 @@ def upgrade() -> None:
     op.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')
     op.execute('CREATE EXTENSION IF NOT EXISTS "pg_trgm"')
     
-    # Create custom enums
-    cost_type_enum = postgresql.ENUM('LABOR', 'PART', 'SERVICE', 'MISC', name='cost_type')
-    approval_state_enum = postgresql.ENUM('PENDING', 'APPROVED', 'REJECTED', name='approval_state')
-    decision_type_enum = postgresql.ENUM('APPROVE', 'REJECT', name='decision_type')
-    pm_trigger_type_enum = postgresql.ENUM('TIME_BASED', 'METER_BASED', 'CONDITION_BASED', 'EVENT_BASED', name='pm_trigger_type')
-    pm_frequency_enum = postgresql.ENUM('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'SEMI_ANNUALLY', 'ANNUALLY', 'CUSTOM', name='pm_frequency')
-    pm_status_enum = postgresql.ENUM('ACTIVE', 'INACTIVE', 'SUSPENDED', name='pm_status')
-    pm_task_status_enum = postgresql.ENUM('SCHEDULED', 'DUE', 'OVERDUE', 'COMPLETED', 'SKIPPED', name='pm_task_status')
+    # Create custom enums once, up front; create_type=False keeps create_table
+    # from emitting CREATE TYPE again for every column that uses them
+    cost_type_enum = postgresql.ENUM('LABOR', 'PART', 'SERVICE', 'MISC', name='cost_type', create_type=False)
+    approval_state_enum = postgresql.ENUM('PENDING', 'APPROVED', 'REJECTED', name='approval_state', create_type=False)
+    decision_type_enum = postgresql.ENUM('APPROVE', 'REJECT', name='decision_type', create_type=False)
+    pm_trigger_type_enum = postgresql.ENUM('TIME_BASED', 'METER_BASED', 'CONDITION_BASED', 'EVENT_BASED', name='pm_trigger_type', create_type=False)
+    pm_frequency_enum = postgresql.ENUM('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'SEMI_ANNUALLY', 'ANNUALLY', 'CUSTOM', name='pm_frequency', create_type=False)
+    pm_status_enum = postgresql.ENUM('ACTIVE', 'INACTIVE', 'SUSPENDED', name='pm_status', create_type=False)
+    pm_task_status_enum = postgresql.ENUM('SCHEDULED', 'DUE', 'OVERDUE', 'COMPLETED', 'SKIPPED', name='pm_task_status', create_type=False)
     
-    cost_type_enum.create(op.get_bind())
-    approval_state_enum.create(op.get_bind())
-    decision_type_enum.create(op.get_bind())
-    pm_trigger_type_enum.create(op.get_bind())
-    pm_frequency_enum.create(op.get_bind())
-    pm_status_enum.create(op.get_bind())
-    pm_task_status_enum.create(op.get_bind())
+    cost_type_enum.create(op.get_bind(), checkfirst=True)
+    approval_state_enum.create(op.get_bind(), checkfirst=True)
+    decision_type_enum.create(op.get_bind(), checkfirst=True)
+    pm_trigger_type_enum.create(op.get_bind(), checkfirst=True)
+    pm_frequency_enum.create(op.get_bind(), checkfirst=True)
+    pm_status_enum.create(op.get_bind(), checkfirst=True)
+    pm_task_status_enum.create(op.get_bind(), checkfirst=True)
     
     # Create companies table
     op.create_table('companies',
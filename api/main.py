@@ -146,7 +146,7 @@ async def ensure_model_loaded():
         try:
             # Check if model exists
             models = ollama.list()
-            if not any(model['name'].startswith(MODEL_NAME) for model in models['models']):
+            if not any(model['model'].startswith(MODEL_NAME) for model in models['models']):
                 logger.info(f"Downloading {MODEL_NAME}...")
                 ollama.pull(MODEL_NAME)
             
@@ -178,7 +178,7 @@ async def health_check():
             "status": "healthy",
             "model": MODEL_NAME,
             "model_loaded": model_loaded,
-            "available_models": [m['name'] for m in models['models']],
+            "available_models": [m['model'] for m in models['models']],
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -3,13 +3,15 @@ Updated ChatterFix CMMS API with PostgreSQL database integration
 Production-ready FastAPI backend with async database operations
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Form, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, File, UploadFile, Form, Depends, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union
-from enum import Enum
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Optional, Dict, Any, Union, Literal
 import ollama
+import httpx
 import json
+import orjson
 import uvicorn
 import asyncio
 import logging
@@ -18,6 +20,8 @@ from datetime import datetime, timedelta
 import uuid
 import mimetypes
 import io
+import re
+import time
 from decimal import Decimal
 from contextlib import asynccontextmanager
 
@@ -55,8 +59,11 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down ChatterFix CMMS API...")
-    await shutdown_database()
-    logger.info("Database connections closed")
+    try:
+        await shutdown_database()
+        logger.info("Database connections closed")
+    finally:
+        await ollama_client.close()
 
 app = FastAPI(
     title="ChatterFix CMMS API",
@@ -76,8 +83,25 @@ app.add_middleware(
 
 # Global model state
 MODEL_NAME = os.getenv("DEFAULT_MODEL", "llama3.2:1b")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 model_loaded = False
 
+# Shared Ollama client so requests reuse keep-alive connections
+ollama_client = ollama.AsyncClient(
+    host=OLLAMA_HOST,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=16)
+)
+
+# Chat context: recent work order titles change rarely, so cache them briefly
+WORK_ORDER_CONTEXT_TTL = 15  # seconds
+_WO_RE = re.compile(r'work[\s_-]?order', re.I)
+_recent_wo_cache: Optional[tuple] = None  # (fetched_at, titles)
+
+# Chat history limits so prompt size stays bounded for long conversations
+MAX_HISTORY_TURNS = 8
+MAX_HISTORY_TOKENS = 1500
+CHAT_NUM_CTX = 4096
+
 # Initialize repositories
 work_order_repo = WorkOrderRepository(db_manager)
 cost_entry_repo = CostEntryRepository(db_manager)
@@ -98,6 +122,21 @@ except Exception as e:
     storage_client = None
     firestore_client = None
 
+def _orjson_default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively (asyncpg NUMERIC and UUID columns)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    # asyncpg returns its own uuid.UUID subclass, which orjson rejects
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError
+
+class RecordJSONResponse(ORJSONResponse):
+    """ORJSONResponse for raw repository rows, skipping Pydantic validation"""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
 def get_bucket():
     if storage_client:
         return storage_client.bucket(BUCKET_NAME)
@@ -140,6 +179,7 @@ class ChatResponse(BaseModel):
     response: str
     timestamp: str
     processing_time: float
+    history_tokens: int = 0
 
 # Document storage models
 class DocumentMetadata(BaseModel):
@@ -159,11 +199,7 @@ class DocumentMetadata(BaseModel):
     extracted_text: Optional[str] = ""
 
 # Financial and Workflow Models
-class CostType(str, Enum):
-    LABOR = "LABOR"
-    PART = "PART"
-    SERVICE = "SERVICE"
-    MISC = "MISC"
+CostType = Literal["LABOR", "PART", "SERVICE", "MISC"]
 
 class CostEntryCreate(BaseModel):
     work_order_id: str
@@ -191,32 +227,10 @@ class FinancialSummary(BaseModel):
     by_type: Dict[str, float]
 
 # Preventive Maintenance Models
-class PMTriggerType(str, Enum):
-    TIME_BASED = "TIME_BASED"
-    METER_BASED = "METER_BASED"
-    CONDITION_BASED = "CONDITION_BASED"
-    EVENT_BASED = "EVENT_BASED"
-
-class PMFrequency(str, Enum):
-    DAILY = "DAILY"
-    WEEKLY = "WEEKLY"
-    MONTHLY = "MONTHLY"
-    QUARTERLY = "QUARTERLY"
-    SEMI_ANNUALLY = "SEMI_ANNUALLY"
-    ANNUALLY = "ANNUALLY"
-    CUSTOM = "CUSTOM"
-
-class PMStatus(str, Enum):
-    ACTIVE = "ACTIVE"
-    INACTIVE = "INACTIVE"
-    SUSPENDED = "SUSPENDED"
-
-class PMTaskStatus(str, Enum):
-    SCHEDULED = "SCHEDULED"
-    DUE = "DUE"
-    OVERDUE = "OVERDUE"
-    COMPLETED = "COMPLETED"
-    SKIPPED = "SKIPPED"
+PMTriggerType = Literal["TIME_BASED", "METER_BASED", "CONDITION_BASED", "EVENT_BASED"]
+PMFrequency = Literal["DAILY", "WEEKLY", "MONTHLY", "QUARTERLY", "SEMI_ANNUALLY", "ANNUALLY", "CUSTOM"]
+PMStatus = Literal["ACTIVE", "INACTIVE", "SUSPENDED"]
+PMTaskStatus = Literal["SCHEDULED", "DUE", "OVERDUE", "COMPLETED", "SKIPPED"]
 
 class PMTaskCreate(BaseModel):
     name: str
@@ -278,6 +292,10 @@ class MeterReading(BaseModel):
     reading_date: Optional[datetime] = None
     read_by: Optional[str] = None
 
+# List adapters compiled once so list endpoints validate and serialize in one pass
+_PM_TASKS_ADAPTER = TypeAdapter(List[PMTaskResponse])
+_PM_SCHEDULE_ADAPTER = TypeAdapter(List[PMScheduleEntry])
+
 # =============================================================================
 # UTILITY FUNCTIONS
 # =============================================================================
@@ -309,19 +327,48 @@ def extract_text_from_file(file_content: bytes, content_type: str) -> str:
         logger.error(f"Text extraction error: {e}")
         return ""
 
+async def get_recent_work_order_titles() -> List[str]:
+    """Get recent work order titles for chat context, cached for a short TTL"""
+    global _recent_wo_cache
+    now = time.monotonic()
+    if _recent_wo_cache and now - _recent_wo_cache[0] < WORK_ORDER_CONTEXT_TTL:
+        return _recent_wo_cache[1]
+    
+    recent_orders = await work_order_repo.get_all(limit=5)
+    titles = [wo['title'] for wo in recent_orders]
+    _recent_wo_cache = (now, titles)
+    return titles
+
+def trim_chat_history(history: List[Dict[str, str]]) -> tuple:
+    """Keep the most recent history turns that fit the token budget (~4 chars per token)"""
+    messages = []
+    history_tokens = 0
+    for msg in reversed(history[-MAX_HISTORY_TURNS:]):
+        content = msg.get('content', '')
+        tokens = len(content) // 4
+        if history_tokens + tokens > MAX_HISTORY_TOKENS:
+            break
+        messages.append({
+            'role': msg.get('role', 'user'),
+            'content': content
+        })
+        history_tokens += tokens
+    messages.reverse()
+    return messages, history_tokens
+
 async def ensure_model_loaded():
     """Ensure the Llama model is loaded and ready"""
     global model_loaded
     if not model_loaded:
         try:
             # Check if model exists
-            models = ollama.list()
-            if not any(model['name'].startswith(MODEL_NAME) for model in models['models']):
+            models = await ollama_client.list()
+            if not any(model['model'].startswith(MODEL_NAME) for model in models['models']):
                 logger.info(f"Downloading {MODEL_NAME}...")
-                ollama.pull(MODEL_NAME)
+                await ollama_client.pull(MODEL_NAME)
             
             # Test the model
-            test_response = ollama.chat(
+            test_response = await ollama_client.chat(
                 model=MODEL_NAME,
                 messages=[{'role': 'user', 'content': 'Hello'}]
             )
@@ -343,14 +390,14 @@ async def health_check():
         db_healthy = await db_manager.health_check()
         
         # Check Ollama health
-        models = ollama.list()
+        models = await ollama_client.list()
         
         return {
             "status": "healthy" if db_healthy else "degraded",
             "database": "connected" if db_healthy else "disconnected",
             "model": MODEL_NAME,
             "model_loaded": model_loaded,
-            "available_models": [m['name'] for m in models['models']],
+            "available_models": [m['model'] for m in models['models']],
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -361,26 +408,29 @@ async def chat_with_llama(request: ChatRequest):
     """Enhanced chat endpoint with database context"""
     start_time = asyncio.get_event_loop().time()
     
-    await ensure_model_loaded()
+    # Fetch work order context concurrently with model verification
+    wo_task = None
+    if _WO_RE.search(request.message):
+        wo_task = asyncio.create_task(get_recent_work_order_titles())
+    
+    try:
+        await ensure_model_loaded()
+    except HTTPException:
+        if wo_task:
+            wo_task.cancel()
+        raise
     
     try:
         # Build context from database if needed
         enhanced_context = request.context
-        if "work order" in request.message.lower():
+        if wo_task:
             # Add recent work orders to context
-            recent_orders = await work_order_repo.get_all(limit=5)
-            if recent_orders:
-                enhanced_context += f"\nRecent work orders: {[wo['title'] for wo in recent_orders]}"
-        
-        # Prepare messages for Ollama
-        messages = []
+            recent_titles = await wo_task
+            if recent_titles:
+                enhanced_context += f"\nRecent work orders: {recent_titles}"
         
-        # Add chat history
-        for msg in request.history:
-            messages.append({
-                'role': msg.get('role', 'user'),
-                'content': msg.get('content', '')
-            })
+        # Prepare messages for Ollama, keeping only recent chat history
+        messages, history_tokens = trim_chat_history(request.history or [])
         
         # Add current message with context
         current_content = request.message
@@ -393,9 +443,10 @@ async def chat_with_llama(request: ChatRequest):
         })
         
         # Generate response
-        response = ollama.chat(
+        response = await ollama_client.chat(
             model=MODEL_NAME,
-            messages=messages
+            messages=messages,
+            options={'num_ctx': CHAT_NUM_CTX}
         )
         
         processing_time = asyncio.get_event_loop().time() - start_time
@@ -403,7 +454,8 @@ async def chat_with_llama(request: ChatRequest):
         return ChatResponse(
             response=response['message']['content'],
             timestamp=datetime.now().isoformat(),
-            processing_time=processing_time
+            processing_time=processing_time,
+            history_tokens=history_tokens
         )
         
     except Exception as e:
@@ -414,13 +466,13 @@ async def chat_with_llama(request: ChatRequest):
 # FINANCIAL MANAGEMENT ENDPOINTS
 # =============================================================================
 
-@app.post("/api/costs", response_model=CostEntryResponse)
+@app.post("/api/costs", status_code=201)
 async def create_cost_entry(cost_entry: CostEntryCreate):
     """Create a new cost entry"""
     try:
         result = await cost_entry_repo.create(cost_entry.dict())
         if result:
-            return CostEntryResponse(**result)
+            return RecordJSONResponse(result, status_code=201)
         raise HTTPException(status_code=400, detail="Failed to create cost entry")
     except Exception as e:
         logger.error(f"Error creating cost entry: {e}")
@@ -433,11 +485,12 @@ async def get_work_order_financials(work_order_id: str):
         entries = await cost_entry_repo.get_by_work_order(work_order_id)
         summary = await cost_entry_repo.get_financials_summary(work_order_id)
         
-        return WorkOrderFinancials(
-            work_order_id=work_order_id,
-            total=summary['total'],
-            entries=[CostEntryResponse(**entry) for entry in entries]
-        )
+        financials = WorkOrderFinancials.model_validate({
+            'work_order_id': work_order_id,
+            'total': summary['total'],
+            'entries': entries
+        })
+        return Response(financials.model_dump_json(), media_type="application/json")
     except Exception as e:
         logger.error(f"Error getting work order financials: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -446,24 +499,28 @@ async def get_work_order_financials(work_order_id: str):
 # PREVENTIVE MAINTENANCE ENDPOINTS
 # =============================================================================
 
-@app.post("/api/preventive-maintenance/tasks", response_model=PMTaskResponse)
+@app.post("/api/preventive-maintenance/tasks", status_code=201)
 async def create_pm_task(pm_task: PMTaskCreate):
     """Create a new preventive maintenance task"""
     try:
         result = await pm_task_repo.create(pm_task.dict())
         if result:
-            return PMTaskResponse(**result)
+            return RecordJSONResponse(result, status_code=201)
         raise HTTPException(status_code=400, detail="Failed to create PM task")
     except Exception as e:
         logger.error(f"Error creating PM task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/preventive-maintenance/tasks", response_model=List[PMTaskResponse])
-async def get_pm_tasks():
-    """Get all preventive maintenance tasks"""
+async def get_pm_tasks(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    """Get preventive maintenance tasks with pagination"""
     try:
-        tasks = await pm_task_repo.get_all()
-        return [PMTaskResponse(**task) for task in tasks]
+        tasks, total = await pm_task_repo.get_page(limit, offset)
+        return Response(
+            _PM_TASKS_ADAPTER.dump_json(_PM_TASKS_ADAPTER.validate_python(tasks)),
+            media_type="application/json",
+            headers={"X-Total-Count": str(total)}
+        )
     except Exception as e:
         logger.error(f"Error getting PM tasks: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -473,7 +530,10 @@ async def get_pm_schedule(start_date: Optional[str] = None, end_date: Optional[s
     """Get preventive maintenance schedule"""
     try:
         schedule = await pm_schedule_repo.get_schedule(start_date, end_date)
-        return [PMScheduleEntry(**entry) for entry in schedule]
+        return Response(
+            _PM_SCHEDULE_ADAPTER.dump_json(_PM_SCHEDULE_ADAPTER.validate_python(schedule)),
+            media_type="application/json"
+        )
     except Exception as e:
         logger.error(f"Error getting PM schedule: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -555,10 +615,15 @@ async def update_work_order(work_order_id: str, update_data: Dict[str, Any]):
 # =============================================================================
 
 @app.get("/api/assets")
-async def get_assets():
-    """Get all assets"""
+async def get_assets(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """Get assets with pagination"""
     try:
-        assets = await asset_repo.get_all()
+        assets, total = await asset_repo.get_page(limit, offset)
+        response.headers["X-Total-Count"] = str(total)
         return assets
     except Exception as e:
         logger.error(f"Error getting assets: {e}")
@@ -608,7 +673,7 @@ Focus on practical, commonly needed fields for {request.industry} maintenance wo
 Respond with JSON only, no additional text.
 """
 
-        response = ollama.chat(
+        response = await ollama_client.chat(
             model=MODEL_NAME,
             messages=[{
                 'role': 'user',
@@ -3,12 +3,21 @@ Data synchronization endpoints for ChatterFix CMMS PWA
 Handles offline/online sync between IndexedDB and PostgreSQL
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional, Literal
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, ConfigDict
+from typing import List, Dict, Any, Optional, Literal, Set, Tuple, AsyncIterator
+from datetime import datetime, timezone
+from collections import defaultdict
+from abc import ABC, abstractmethod
+import asyncio
+import contextvars
+import os
 import uuid
 import logging
+import orjson
+import ormsgpack
 from contextlib import asynccontextmanager
 
 from database.config import db_manager
@@ -19,8 +28,90 @@ from database.repositories import (
 
 logger = logging.getLogger(__name__)
 
+# Lowest possible id, used when a change cursor has only a timestamp
+NIL_UUID = uuid.UUID(int=0)
+
+# Marks a server record that has not been looked up yet
+_NOT_FETCHED = object()
+
+class SyncConflictError(Exception):
+    """The server record changed after the client's operation was made"""
+
+def _uuid4_batch(count: int) -> List[uuid.UUID]:
+    """Generate random UUIDs from a single os.urandom() call"""
+    random_bytes = os.urandom(16 * count)
+    return [
+        uuid.UUID(bytes=random_bytes[i * 16:(i + 1) * 16], version=4)
+        for i in range(count)
+    ]
+
+# Namespace for deriving sync_status ids from client operation ids that are not UUIDs
+SYNC_OPERATION_NAMESPACE = uuid.UUID('6f1c2d4e-8a3b-5c7d-9e0f-1a2b3c4d5e6f')
+
+def operation_status_id(operation_id: str) -> uuid.UUID:
+    """sync_status id recording a client operation (stable across client retries)"""
+    try:
+        return uuid.UUID(operation_id)
+    except ValueError:
+        return uuid.uuid5(SYNC_OPERATION_NAMESPACE, operation_id)
+
+def _record_uuid(record_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(record_id)
+    except ValueError:
+        return NIL_UUID
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+class MsgPackRequest(Request):
+    """Request whose body is msgpack but is exposed to FastAPI as JSON-like data"""
+    
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = ormsgpack.unpackb(await self.body())
+        return self._json
+
+class MsgPackRoute(APIRoute):
+    """Route that accepts msgpack request bodies (Content-Type: application/msgpack)"""
+    
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+        
+        async def route_handler(request: Request) -> Response:
+            if request.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE):
+                # Present the body as JSON so FastAPI validates it against the model
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (key, b"application/json" if key == b"content-type" else value)
+                    for key, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+            return await original_route_handler(request)
+        
+        return route_handler
+
+def negotiated_response(request: Request, content: Dict[str, Any]) -> Response:
+    """Respond with msgpack when the client accepts it, otherwise JSON"""
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(
+            ormsgpack.packb(content, default=_msgpack_default),
+            media_type=MSGPACK_MEDIA_TYPE
+        )
+    return ORJSONResponse(content)
+
+def _msgpack_default(obj: Any) -> Any:
+    # Server change rows carry pre-encoded JSON fragments
+    if isinstance(obj, orjson.Fragment):
+        return orjson.loads(orjson.dumps(obj))
+    raise TypeError
+
 # Create sync router
-sync_router = APIRouter(prefix="/api/sync", tags=["synchronization"])
+sync_router = APIRouter(
+    prefix="/api/sync",
+    tags=["synchronization"],
+    default_response_class=ORJSONResponse,
+    route_class=MsgPackRoute
+)
 
 # Initialize repositories
 work_order_repo = WorkOrderRepository(db_manager)
@@ -30,12 +121,91 @@ pm_schedule_repo = PMScheduleRepository(db_manager)
 asset_repo = AssetRepository(db_manager)
 user_repo = UserRepository(db_manager)
 
+# =============================================================================
+# SYNC SQL
+# =============================================================================
+
+# Maximum rows returned per table when fetching server changes
+WORK_ORDER_CHANGES_LIMIT = 100
+PM_TASK_CHANGES_LIMIT = 50
+PM_SCHEDULE_CHANGES_LIMIT = 100
+
+# Built once so every call sends identical text and hits asyncpg's
+# per-connection prepared statement cache (no re-parse/re-plan)
+_WO_CHANGES_SQL = f"""
+            (SELECT 'work_orders' as table_name, 'UPDATE' as operation,
+                    id as record_id, updated_at, row_to_json(work_orders.*)::text as data
+             FROM work_orders
+             WHERE (updated_at, id) > ($1, $2)
+             ORDER BY updated_at, id
+             LIMIT {WORK_ORDER_CHANGES_LIMIT})"""
+
+_PM_CHANGES_SQL = f"""
+            (SELECT 'pm_tasks' as table_name, 'UPDATE' as operation,
+                    id as record_id, updated_at, row_to_json(pm_tasks.*)::text as data
+             FROM pm_tasks
+             WHERE (updated_at, id) > ($1, $2)
+             ORDER BY updated_at, id
+             LIMIT {PM_TASK_CHANGES_LIMIT})"""
+
+_SCHED_CHANGES_SQL = f"""
+            (SELECT 'pm_schedule' as table_name, 'UPDATE' as operation,
+                    id as record_id, updated_at, row_to_json(pm_schedule.*)::text as data
+             FROM pm_schedule
+             WHERE (updated_at, id) > ($1, $2)
+             ORDER BY updated_at, id
+             LIMIT {PM_SCHEDULE_CHANGES_LIMIT})"""
+
+# Server changes for all three tables in one query, seeking on the (updated_at, id) indexes
+_CHANGES_SQL = "\n            UNION ALL".join((_WO_CHANGES_SQL, _PM_CHANGES_SQL, _SCHED_CHANGES_SQL))
+
+# Current id/updated_at of sync target records, per table
+_EXISTING_SQL = {
+    table_name: f"SELECT id, updated_at FROM {table_name} WHERE id = ANY($1::uuid[])"
+    for table_name in ('work_orders', 'pm_tasks', 'pm_schedule', 'cost_entries', 'assets')
+}
+
+_FILTER_SYNCED_SQL = "SELECT id FROM sync_status WHERE id = ANY($1::uuid[]) AND synced = true"
+
+_RECORD_SYNCED_SQL = """
+            INSERT INTO sync_status (id, table_name, record_id, operation, client_id, synced, synced_at)
+            VALUES ($1, $2, $3, $4, $5, true, $6)
+            ON CONFLICT (id) DO UPDATE SET synced = true, synced_at = EXCLUDED.synced_at
+            """
+
+_PING_SQL = """
+            INSERT INTO sync_status (id, table_name, record_id, operation, client_id, synced, created_at)
+            VALUES ($1, 'ping', $2, 'PING', $3, true, CURRENT_TIMESTAMP)
+            """
+
+_PENDING_BY_TABLE_SQL = """
+        SELECT table_name, COUNT(*) as pending_count
+        FROM sync_status 
+        WHERE client_id = $1 AND synced = false
+        GROUP BY table_name
+        """
+
+_LAST_SYNC_SQL = """
+        SELECT MAX(synced_at) as last_sync
+        FROM sync_status 
+        WHERE client_id = $1 AND synced = true
+        """
+
+_RESOLVE_CONFLICT_SQL = """
+                    UPDATE sync_status 
+                    SET synced = true, synced_at = CURRENT_TIMESTAMP,
+                        error_message = $3
+                    WHERE record_id = $1 AND table_name = $2
+                    """
+
 # =============================================================================
 # SYNC DATA MODELS
 # =============================================================================
 
 class SyncOperation(BaseModel):
     """Represents a single sync operation"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     id: str
     operation: Literal["CREATE", "UPDATE", "DELETE"]
     table_name: str
@@ -46,16 +216,20 @@ class SyncOperation(BaseModel):
 
 class SyncRequest(BaseModel):
     """Batch sync request from client"""
+    model_config = ConfigDict(extra="ignore")
+    
     client_id: str
     operations: List[SyncOperation]
     last_sync_timestamp: Optional[datetime] = None
+    last_sync_record_id: Optional[str] = None  # Keyset cursor tie-breaker from next_cursor
 
 class SyncResponse(BaseModel):
     """Sync response to client"""
     success: bool
     processed_operations: List[str]  # IDs of successfully processed operations
     failed_operations: List[Dict[str, Any]]  # Failed operations with error details
-    server_changes: List[Dict[str, Any]]  # Changes from server since last sync
+    server_changes: List[Dict[str, Any]]  # Changes from server since last sync (data is raw JSON)
+    next_cursor: Optional[Dict[str, Any]] = None  # Cursor to fetch the following changes
     sync_timestamp: datetime
 
 class ConflictResolution(BaseModel):
@@ -67,6 +241,60 @@ class ConflictResolution(BaseModel):
 # SYNC UTILITIES
 # =============================================================================
 
+# Merge type per (table, column) for the "merge" conflict strategy; other columns are
+# last-writer-wins registers. "set" columns merge as add-wins sets (adds from either
+# side are kept, removals relative to the common base are applied).
+MERGE_FIELD_TYPES = {
+    ('work_orders', 'tags'): 'set',
+    ('pm_tasks', 'required_parts'): 'set',
+    ('pm_tasks', 'required_skills'): 'set',
+}
+
+# Columns the merge never writes
+_MERGE_SKIP_FIELDS = {'id', 'created_at', 'updated_at'}
+
+_NO_BASE = object()
+
+def merge_field(kind: str, server_value: Any, client_value: Any, base_value: Any, client_is_newer: bool) -> Any:
+    """Merge one field of a conflicting record (deterministic for the same inputs)"""
+    if kind == 'set':
+        server_items = list(server_value or [])
+        client_items = list(client_value or [])
+        if base_value is _NO_BASE:
+            removed = set()
+        else:
+            base_items = set(base_value or [])
+            removed = (base_items - set(server_items)) | (base_items - set(client_items))
+        return [item for item in dict.fromkeys(server_items + client_items) if item not in removed]
+    
+    # Last-writer-wins register; with a base, a side that left the field unchanged loses
+    if base_value is not _NO_BASE:
+        if client_value == base_value:
+            return server_value
+        if server_value == base_value:
+            return client_value
+    return client_value if client_is_newer else server_value
+
+def merge_record(
+    table_name: str,
+    server_record: Dict[str, Any],
+    client_data: Dict[str, Any],
+    base_data: Optional[Dict[str, Any]],
+    client_is_newer: bool
+) -> Dict[str, Any]:
+    """Merge client changes into the server record, returning only the fields that change"""
+    changes = {}
+    for field, client_value in client_data.items():
+        if field in _MERGE_SKIP_FIELDS or field not in server_record:
+            continue
+        server_value = server_record[field]
+        base_value = base_data.get(field, _NO_BASE) if base_data else _NO_BASE
+        kind = MERGE_FIELD_TYPES.get((table_name, field), 'lww')
+        merged = merge_field(kind, server_value, client_value, base_value, client_is_newer)
+        if merged != server_value:
+            changes[field] = merged
+    return changes
+
 class SyncManager:
     """Manages data synchronization between client and server"""
     
@@ -78,203 +306,527 @@ class SyncManager:
             'cost_entries': cost_entry_repo,
             'assets': asset_repo
         }
+        # Repository capabilities resolved once instead of hasattr() per operation
+        self._repo_caps = {
+            name: {
+                'get': hasattr(repo, 'get_by_id'),
+                'update': hasattr(repo, 'update'),
+                'delete': hasattr(repo, 'delete'),
+                'delete_many': hasattr(repo, 'delete_many')
+            }
+            for name, repo in self.repositories.items()
+        }
     
     async def process_client_operations(self, operations: List[SyncOperation]) -> Dict[str, Any]:
         """Process operations from client"""
         processed = []
         failed = []
         
-        for operation in operations:
-            try:
-                result = await self._process_single_operation(operation)
-                if result:
-                    processed.append(operation.id)
+        # Operations on the same record run in order, one record after another
+        by_record = defaultdict(list)
+        for index, operation in enumerate(operations):
+            by_record[(operation.table_name, operation.record_id)].append(index)
+        
+        # A lone DELETE on a record is aggregated into one bulk delete per table
+        bulk_deletes = defaultdict(list)
+        for (table_name, _), indexes in list(by_record.items()):
+            caps = self._repo_caps.get(table_name)
+            if (len(indexes) == 1 and operations[indexes[0]].operation == "DELETE"
+                    and caps and caps['delete_many']):
+                bulk_deletes[table_name].append(indexes[0])
+                del by_record[(table_name, operations[indexes[0]].record_id)]
+        
+        # Server state for each record's first operation, fetched with one query per table
+        existing = await self._prefetch_existing(
+            [operations[indexes[0]] for indexes in by_record.values()]
+        )
+        
+        outcomes: List[Any] = [None] * len(operations)
+        
+        async def run_record_operations(indexes: List[int]):
+            for position, index in enumerate(indexes):
+                operation = operations[index]
+                # Later operations on the same record must see the earlier writes
+                current = (
+                    existing.get((operation.table_name, operation.record_id), _NOT_FETCHED)
+                    if position == 0 else _NOT_FETCHED
+                )
+                try:
+                    async with self._operation_scope():
+                        outcomes[index] = await self._process_single_operation(operation, current)
+                except Exception as e:
+                    outcomes[index] = e
+        
+        async def run_bulk_delete(table_name: str, indexes: List[int]):
+            # One malformed id would fail the ::uuid[] cast for the whole table
+            record_ids = {}
+            for index in indexes:
+                record_uuid = _record_uuid(operations[index].record_id)
+                if record_uuid == NIL_UUID:
+                    outcomes[index] = ValueError(f"Invalid record_id: {operations[index].record_id}")
                 else:
-                    failed.append({
-                        "operation_id": operation.id,
-                        "error": "Operation failed - no result returned"
-                    })
+                    record_ids[index] = str(record_uuid)
+            if not record_ids:
+                return
+            try:
+                async with self._operation_scope():
+                    deleted = set(await self.repositories[table_name].delete_many(
+                        list(record_ids.values()),
+                        [operations[index].client_timestamp for index in record_ids]
+                    ))
+                for index, record_id in record_ids.items():
+                    outcomes[index] = record_id in deleted
             except Exception as e:
-                logger.error(f"Sync operation failed: {operation.id} - {e}")
+                for index in record_ids:
+                    outcomes[index] = e
+        
+        jobs = [
+            *(run_record_operations(indexes) for indexes in by_record.values()),
+            *(run_bulk_delete(table_name, indexes) for table_name, indexes in bulk_deletes.items())
+        ]
+        # Sequential: /batch runs on one bound transaction connection, which
+        # cannot run queries concurrently
+        for job in jobs:
+            await job
+        
+        for operation, outcome in zip(operations, outcomes):
+            if isinstance(outcome, SyncConflictError):
+                failed.append({
+                    "operation_id": operation.id,
+                    "error": "conflict"
+                })
+            elif isinstance(outcome, Exception):
+                logger.error(f"Sync operation failed: {operation.id} - {outcome}")
                 failed.append({
                     "operation_id": operation.id,
-                    "error": str(e)
+                    "error": str(outcome)
+                })
+            elif outcome:
+                processed.append(operation.id)
+            else:
+                failed.append({
+                    "operation_id": operation.id,
+                    "error": "Operation failed - no result returned"
                 })
         
         return {"processed": processed, "failed": failed}
     
-    async def _process_single_operation(self, operation: SyncOperation) -> bool:
+    @asynccontextmanager
+    async def _operation_scope(self):
+        """Inside a batch transaction, isolate the operation in a savepoint"""
+        if db_manager.has_bound_connection():
+            async with db_manager.get_transaction():
+                yield
+        else:
+            yield
+    
+    async def _prefetch_existing(self, operations: List[SyncOperation]) -> Dict[tuple, Optional[Dict[str, Any]]]:
+        """Look up id and updated_at for the records of CREATE/UPDATE operations.
+        
+        Returns {(table_name, record_id): row or None when missing}; records that could
+        not be looked up are left out and fetched individually by the handlers.
+        """
+        ids_by_table = defaultdict(list)
+        for operation in operations:
+            caps = self._repo_caps.get(operation.table_name)
+            if operation.operation in ("CREATE", "UPDATE") and caps and caps['get']:
+                try:
+                    uuid.UUID(operation.record_id)
+                except ValueError:
+                    continue
+                ids_by_table[operation.table_name].append(operation.record_id)
+        
+        existing = {}
+        for table_name, record_ids in ids_by_table.items():
+            rows = await db_manager.fetch(_EXISTING_SQL[table_name], record_ids)
+            found = {str(row['id']): dict(row) for row in rows}
+            for record_id in record_ids:
+                existing[(table_name, record_id)] = found.get(record_id.lower())
+        
+        return existing
+    
+    async def _process_single_operation(self, operation: SyncOperation, current: Any = _NOT_FETCHED) -> bool:
         """Process a single sync operation"""
         repo = self.repositories.get(operation.table_name)
         if not repo:
             raise ValueError(f"Unknown table: {operation.table_name}")
         
-        if operation.operation == "CREATE":
-            return await self._handle_create(repo, operation)
-        elif operation.operation == "UPDATE":
-            return await self._handle_update(repo, operation)
-        elif operation.operation == "DELETE":
-            return await self._handle_delete(repo, operation)
-        else:
+        handler = self._HANDLERS.get(operation.operation)
+        if not handler:
             raise ValueError(f"Unknown operation: {operation.operation}")
+        
+        return await handler(self, repo, self._repo_caps[operation.table_name], operation, current)
     
-    async def _handle_create(self, repo, operation: SyncOperation) -> bool:
+    async def _handle_create(self, repo, caps: Dict[str, bool], operation: SyncOperation,
+                             current: Any = _NOT_FETCHED) -> bool:
         """Handle create operation with conflict detection"""
         # Check if record already exists
-        existing = None
-        if hasattr(repo, 'get_by_id'):
-            existing = await repo.get_by_id(operation.record_id)
+        if current is _NOT_FETCHED:
+            current = await repo.get_by_id(operation.record_id) if caps['get'] else None
         
-        if existing:
+        if current:
             # Record exists - convert to update operation
             logger.info(f"Converting CREATE to UPDATE for {operation.record_id}")
-            return await self._handle_update(repo, operation)
+            return await self._handle_update(repo, caps, operation, current)
         
-        # Create new record
-        data = operation.data.copy()
-        data['id'] = operation.record_id
+        # Create new record (operation.data is parsed per request, so set the id in place)
+        operation.data['id'] = operation.record_id
         
-        result = await repo.create(data)
+        result = await repo.create(operation.data)
         return result is not None
     
-    async def _handle_update(self, repo, operation: SyncOperation) -> bool:
+    async def _handle_update(self, repo, caps: Dict[str, bool], operation: SyncOperation,
+                             current: Any = _NOT_FETCHED) -> bool:
         """Handle update operation with conflict resolution"""
         # Get current server version
-        if hasattr(repo, 'get_by_id'):
-            current = await repo.get_by_id(operation.record_id)
+        if caps['get']:
+            if current is _NOT_FETCHED:
+                current = await repo.get_by_id(operation.record_id)
             if not current:
                 # Record doesn't exist - convert to create
                 logger.info(f"Converting UPDATE to CREATE for {operation.record_id}")
-                return await self._handle_create(repo, operation)
-            
-            # Check for conflicts
-            conflict_detected = await self._detect_conflicts(current, operation)
-            if conflict_detected:
+                return await self._handle_create(repo, caps, operation, None)
+        
+        # Update record only if the server has not changed it since the client did
+        # (checked in the UPDATE itself, so there is no window between check and write)
+        if caps['update'] and operation.data:
+            result = await repo.update(
+                operation.record_id, operation.data,
+                expected_max_updated_at=operation.client_timestamp
+            )
+            if result is None:
                 # Apply conflict resolution (for now, server wins)
                 logger.warning(f"Conflict detected for {operation.record_id}, server wins")
-                return False
-        
-        # Update record
-        if hasattr(repo, 'update'):
-            result = await repo.update(operation.record_id, operation.data)
-            return result is not None
+                raise SyncConflictError("conflict")
+            return True
         
         return False
     
-    async def _handle_delete(self, repo, operation: SyncOperation) -> bool:
+    async def _handle_delete(self, repo, caps: Dict[str, bool], operation: SyncOperation,
+                             current: Any = _NOT_FETCHED) -> bool:
         """Handle delete operation"""
-        if hasattr(repo, 'delete'):
-            return await repo.delete(operation.record_id)
+        if caps['delete']:
+            return await repo.delete(
+                operation.record_id,
+                expected_max_updated_at=operation.client_timestamp
+            )
         return False
     
-    async def _detect_conflicts(self, server_record: Dict[str, Any], operation: SyncOperation) -> bool:
-        """Detect conflicts between server and client versions"""
-        # Simple conflict detection based on updated_at timestamp
-        server_updated = server_record.get('updated_at')
-        client_timestamp = operation.client_timestamp
-        
-        if server_updated and client_timestamp:
-            # If server was updated after client timestamp, there's a conflict
-            return server_updated > client_timestamp
-        
-        return False
+    _HANDLERS = {
+        "CREATE": _handle_create,
+        "UPDATE": _handle_update,
+        "DELETE": _handle_delete
+    }
     
-    async def get_server_changes(self, client_id: str, last_sync: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Get changes from server since last sync"""
-        changes = []
-        
+    @staticmethod
+    def _changes_cursor_args(
+        last_sync: Optional[datetime],
+        last_record_id: Optional[str],
+        now: Optional[datetime]
+    ) -> Tuple[datetime, Any]:
+        """Query arguments for a changes cursor; first sync returns data changed today (UTC)"""
         if not last_sync:
-            # First sync - return all recent data
-            last_sync = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            now = now or datetime.now(timezone.utc)
+            last_sync = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return last_sync, last_record_id or NIL_UUID
+    
+    @staticmethod
+    def _row_to_change(row) -> Dict[str, Any]:
+        change = dict(row)
+        # asyncpg's UUID subclass is not serializable by orjson or ormsgpack
+        change['record_id'] = str(change['record_id'])
+        # Embed the JSON Postgres already produced instead of parsing and re-encoding it
+        change['data'] = orjson.Fragment(change['data'])
+        return change
+    
+    async def get_server_changes(
+        self,
+        client_id: str,
+        last_sync: Optional[datetime] = None,
+        last_record_id: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Get changes from server after the (last_sync, last_record_id) cursor, oldest first"""
+        changes = []
         
         try:
-            # Get recent work orders
-            query = """
-            SELECT 'work_orders' as table_name, 'UPDATE' as operation, 
-                   id as record_id, row_to_json(work_orders.*) as data
-            FROM work_orders 
-            WHERE updated_at > $1
-            ORDER BY updated_at DESC
-            LIMIT 100
-            """
-            
-            rows = await db_manager.fetch(query, last_sync)
-            for row in rows:
-                changes.append(dict(row))
-            
-            # Get recent PM tasks
-            query = """
-            SELECT 'pm_tasks' as table_name, 'UPDATE' as operation,
-                   id as record_id, row_to_json(pm_tasks.*) as data
-            FROM pm_tasks 
-            WHERE updated_at > $1
-            ORDER BY updated_at DESC
-            LIMIT 50
-            """
-            
-            rows = await db_manager.fetch(query, last_sync)
-            for row in rows:
-                changes.append(dict(row))
-            
-            # Get recent PM schedule changes
-            query = """
-            SELECT 'pm_schedule' as table_name, 'UPDATE' as operation,
-                   id as record_id, row_to_json(pm_schedule.*) as data
-            FROM pm_schedule 
-            WHERE updated_at > $1
-            ORDER BY updated_at DESC
-            LIMIT 100
-            """
-            
-            rows = await db_manager.fetch(query, last_sync)
+            rows = await db_manager.fetch(
+                _CHANGES_SQL,
+                *self._changes_cursor_args(last_sync, last_record_id, now)
+            )
             for row in rows:
-                changes.append(dict(row))
+                changes.append(self._row_to_change(row))
         
         except Exception as e:
             logger.error(f"Error getting server changes: {e}")
         
         return changes
+    
+    async def stream_server_changes(
+        self,
+        client_id: str,
+        last_sync: Optional[datetime] = None,
+        last_record_id: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield server changes as NDJSON lines while rows arrive from the database"""
+        async with db_manager.get_transaction() as conn:
+            async for row in conn.cursor(
+                _CHANGES_SQL,
+                *self._changes_cursor_args(last_sync, last_record_id, None),
+                prefetch=50
+            ):
+                yield orjson.dumps(self._row_to_change(row)) + b"\n"
+    
+    async def merge_conflict(self, conflict: Dict[str, Any], field_mappings: Optional[Dict[str, str]] = None) -> bool:
+        """Merge a conflicting client change into the server record.
+        
+        The conflict carries the client's "data", optionally the "base" record the client
+        edited and its "client_timestamp". Returns False if the record is missing or
+        changed again while merging.
+        """
+        table_name = conflict.get('table_name')
+        record_id = conflict.get('record_id')
+        repo = self.repositories.get(table_name)
+        caps = self._repo_caps.get(table_name)
+        if not repo or not caps['get'] or not caps['update']:
+            raise ValueError(f"Merge not supported for table: {table_name}")
+        
+        server_record = await repo.get_by_id(record_id)
+        if not server_record:
+            return False
+        
+        mappings = field_mappings or {}
+        client_data = {mappings.get(k, k): v for k, v in (conflict.get('data') or {}).items()}
+        base_data = conflict.get('base')
+        if base_data:
+            base_data = {mappings.get(k, k): v for k, v in base_data.items()}
+        
+        client_timestamp = conflict.get('client_timestamp')
+        client_is_newer = False
+        server_updated = server_record.get('updated_at')
+        if client_timestamp:
+            client_time = datetime.fromisoformat(str(client_timestamp).replace('Z', '+00:00'))
+            if client_time.tzinfo is None:
+                client_time = client_time.replace(tzinfo=timezone.utc)
+            client_is_newer = server_updated is None or client_time > server_updated
+        
+        changes = merge_record(table_name, server_record, client_data, base_data, client_is_newer)
+        if not changes:
+            return True
+        
+        # Write against the server version we merged with
+        result = await repo.update(record_id, changes, expected_max_updated_at=server_updated)
+        return result is not None
+    
+    async def filter_synced_operations(self, operations: List[SyncOperation]) -> Tuple[List[SyncOperation], List[str]]:
+        """Split operations into those still to apply and ids of those already synced (retries)"""
+        if not operations:
+            return [], []
+        
+        rows = await db_manager.fetch(
+            _FILTER_SYNCED_SQL,
+            [operation_status_id(operation.id) for operation in operations]
+        )
+        synced = {row['id'] for row in rows}
+        
+        pending = []
+        already_synced = []
+        for operation in operations:
+            if operation_status_id(operation.id) in synced:
+                already_synced.append(operation.id)
+            else:
+                pending.append(operation)
+        return pending, already_synced
+    
+    async def record_synced_operations(
+        self,
+        operations: List[SyncOperation],
+        client_id: str,
+        synced_at: datetime
+    ) -> None:
+        """Record applied operations in sync_status, keyed by operation id"""
+        if not operations:
+            return
+        
+        # Pipelined executemany, one round-trip
+        await db_manager.executemany(
+            _RECORD_SYNCED_SQL,
+            [
+                (
+                    operation_status_id(operation.id), operation.table_name,
+                    _record_uuid(operation.record_id), operation.operation,
+                    client_id, synced_at
+                )
+                for operation in operations
+            ]
+        )
+    
+    async def record_synced_operations_safely(
+        self,
+        operations: List[SyncOperation],
+        client_id: str,
+        synced_at: datetime
+    ) -> None:
+        """record_synced_operations for background use: failures are logged, not raised"""
+        try:
+            await self.record_synced_operations(operations, client_id, synced_at)
+        except Exception as e:
+            logger.error(f"Failed to record synced operations for {client_id}: {e}")
+    
+    def next_changes_cursor(self, changes: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Get the cursor to resume fetching after a page of server changes.
+        
+        If a table hit its row limit, resume from the earliest such table's last row so
+        none of its rows are skipped (rows already sent from other tables may repeat).
+        """
+        if not changes:
+            return None
+        
+        limits = {
+            'work_orders': WORK_ORDER_CHANGES_LIMIT,
+            'pm_tasks': PM_TASK_CHANGES_LIMIT,
+            'pm_schedule': PM_SCHEDULE_CHANGES_LIMIT
+        }
+        counts = defaultdict(int)
+        last_by_table = {}
+        for change in changes:
+            counts[change['table_name']] += 1
+            last_by_table[change['table_name']] = (change['updated_at'], change['record_id'])
+        
+        truncated = [
+            last for table_name, last in last_by_table.items()
+            if counts[table_name] >= limits[table_name]
+        ]
+        updated_at, record_id = min(truncated) if truncated else max(last_by_table.values())
+        return {"updated_at": updated_at, "record_id": str(record_id)}
+
+class AsyncBatcher(ABC):
+    """Coalesces items submitted within a short window into one process_batch() call"""
+    
+    def __init__(self, max_batch_size: int = 500, max_queue_time: float = 0.05):
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+    
+    async def process(self, item: Any) -> None:
+        """Queue an item and wait until its batch has been processed"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_queue_time, self._flush)
+        
+        await future
+    
+    @abstractmethod
+    async def process_batch(self, items: List[Any]) -> None:
+        """Process a batch of queued items"""
+    
+    async def drain(self) -> None:
+        """Flush queued items and wait for in-flight batches (call on shutdown)"""
+        if self._pending:
+            self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Fresh context so the batch never runs on a caller's bound transaction connection
+        task = asyncio.create_task(self._run_batch(batch), context=contextvars.Context())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            await self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
 
-# Initialize sync manager
+class PingBatcher(AsyncBatcher):
+    """Records client pings in sync_status with one batched insert"""
+    
+    async def process_batch(self, client_ids: List[str]) -> None:
+        # Pings are not tied to a record; record_id is a UUID column
+        await db_manager.executemany(
+            _PING_SQL,
+            [
+                (ping_id, NIL_UUID, client_id)
+                for ping_id, client_id in zip(_uuid4_batch(len(client_ids)), client_ids)
+            ]
+        )
+
+# Initialize sync manager and write batchers
 sync_manager = SyncManager()
+ping_batcher = PingBatcher(max_batch_size=500, max_queue_time=0.05)
+
+async def shutdown_sync():
+    """Drain queued sync writes; call from the lifespan of apps that mount sync_router"""
+    await ping_batcher.drain()
 
 # =============================================================================
 # SYNC ENDPOINTS
 # =============================================================================
 
 @sync_router.post("/batch", response_model=SyncResponse)
-async def sync_batch_operations(request: SyncRequest):
-    """Process batch sync operations from client"""
+async def sync_batch_operations(
+    request: SyncRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks
+):
+    """Process batch sync operations from client (JSON or msgpack, negotiated by headers)"""
     try:
+        request_now = datetime.now(timezone.utc)
         logger.info(f"Processing sync batch: {len(request.operations)} operations from {request.client_id}")
         
-        # Process client operations
-        results = await sync_manager.process_client_operations(request.operations)
+        # Apply client operations in one transaction (single commit)
+        async with db_manager.bound_transaction():
+            # Operations retried after an earlier successful sync are not applied again
+            pending, already_synced = await sync_manager.filter_synced_operations(request.operations)
+            
+            # Process client operations
+            results = await sync_manager.process_client_operations(pending)
+        
+        # Record successful sync in sync_status table after the response is sent
+        processed_ids = set(results["processed"])
+        background_tasks.add_task(
+            sync_manager.record_synced_operations_safely,
+            [operation for operation in pending if operation.id in processed_ids],
+            request.client_id,
+            request_now
+        )
+        results["processed"] = already_synced + results["processed"]
         
         # Get server changes since last sync
         server_changes = await sync_manager.get_server_changes(
             request.client_id, 
-            request.last_sync_timestamp
+            request.last_sync_timestamp,
+            request.last_sync_record_id,
+            request_now
         )
         
-        # Record successful sync in sync_status table
-        for op_id in results["processed"]:
-            await db_manager.execute(
-                """
-                INSERT INTO sync_status (id, table_name, record_id, operation, client_id, synced, synced_at)
-                VALUES ($1, $2, $3, $4, $5, true, CURRENT_TIMESTAMP)
-                ON CONFLICT (id) DO UPDATE SET synced = true, synced_at = CURRENT_TIMESTAMP
-                """,
-                str(uuid.uuid4()), "batch", "batch", "SYNC", request.client_id
-            )
-        
-        return SyncResponse(
-            success=len(results["failed"]) == 0,
-            processed_operations=results["processed"],
-            failed_operations=results["failed"],
-            server_changes=server_changes,
-            sync_timestamp=datetime.now()
-        )
+        # Serialized directly with orjson/ormsgpack; SyncResponse documents the shape
+        return negotiated_response(http_request, {
+            "success": len(results["failed"]) == 0,
+            "processed_operations": results["processed"],
+            "failed_operations": results["failed"],
+            "server_changes": server_changes,
+            "next_cursor": sync_manager.next_changes_cursor(server_changes),
+            "sync_timestamp": request_now
+        })
         
     except Exception as e:
         logger.error(f"Batch sync error: {e}")
@@ -284,24 +836,11 @@ async def sync_batch_operations(request: SyncRequest):
 async def get_sync_status(client_id: str):
     """Get sync status for a specific client"""
     try:
-        query = """
-        SELECT table_name, COUNT(*) as pending_count
-        FROM sync_status 
-        WHERE client_id = $1 AND synced = false
-        GROUP BY table_name
-        """
-        
-        rows = await db_manager.fetch(query, client_id)
+        rows = await db_manager.fetch(_PENDING_BY_TABLE_SQL, client_id)
         pending_by_table = {row['table_name']: row['pending_count'] for row in rows}
         
         # Get last sync timestamp
-        last_sync_query = """
-        SELECT MAX(synced_at) as last_sync
-        FROM sync_status 
-        WHERE client_id = $1 AND synced = true
-        """
-        
-        last_sync_row = await db_manager.fetchrow(last_sync_query, client_id)
+        last_sync_row = await db_manager.fetchrow(_LAST_SYNC_SQL, client_id)
         last_sync = last_sync_row['last_sync'] if last_sync_row else None
         
         return {
@@ -332,13 +871,7 @@ async def resolve_sync_conflicts(
             if resolution.strategy == "server_wins":
                 # Keep server version, mark client operation as resolved
                 await db_manager.execute(
-                    """
-                    UPDATE sync_status 
-                    SET synced = true, synced_at = CURRENT_TIMESTAMP,
-                        error_message = 'Resolved: server_wins'
-                    WHERE record_id = $1 AND table_name = $2
-                    """,
-                    record_id, table_name
+                    _RESOLVE_CONFLICT_SQL, record_id, table_name, 'Resolved: server_wins'
                 )
                 
             elif resolution.strategy == "client_wins":
@@ -347,9 +880,19 @@ async def resolve_sync_conflicts(
                 pass
                 
             elif resolution.strategy == "merge":
-                # Merge changes based on field mappings
-                # This is more complex and would require field-level merge logic
-                pass
+                # Field-level merge: add-wins sets for list columns, LWW for the rest
+                merged = await sync_manager.merge_conflict(conflict, resolution.field_mappings)
+                if not merged:
+                    resolved_conflicts.append({
+                        "record_id": record_id,
+                        "table_name": table_name,
+                        "resolution": "failed"
+                    })
+                    continue
+                
+                await db_manager.execute(
+                    _RESOLVE_CONFLICT_SQL, record_id, table_name, 'Resolved: merge'
+                )
             
             resolved_conflicts.append({
                 "record_id": record_id,
@@ -360,7 +903,7 @@ async def resolve_sync_conflicts(
         return {
             "resolved_conflicts": resolved_conflicts,
             "resolution_strategy": resolution.strategy,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
     except Exception as e:
@@ -370,47 +913,62 @@ async def resolve_sync_conflicts(
 @sync_router.get("/changes/{client_id}")
 async def get_server_changes_since_last_sync(
     client_id: str, 
-    since: Optional[str] = None
+    since: Optional[str] = None,
+    since_record_id: Optional[str] = None
 ):
-    """Get server changes since specified timestamp"""
+    """Get server changes since specified timestamp (and record id, from next_cursor)"""
     try:
         last_sync = None
         if since:
             last_sync = datetime.fromisoformat(since.replace('Z', '+00:00'))
         
-        changes = await sync_manager.get_server_changes(client_id, last_sync)
+        changes = await sync_manager.get_server_changes(client_id, last_sync, since_record_id)
         
-        return {
+        return ORJSONResponse({
             "client_id": client_id,
             "since": since,
             "changes_count": len(changes),
             "changes": changes,
-            "timestamp": datetime.now().isoformat()
-        }
+            "next_cursor": sync_manager.next_changes_cursor(changes),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
         
     except Exception as e:
         logger.error(f"Error getting server changes: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@sync_router.get("/changes/{client_id}/stream")
+async def stream_server_changes_since_last_sync(
+    client_id: str,
+    since: Optional[str] = None,
+    since_record_id: Optional[str] = None
+):
+    """Stream server changes as NDJSON (one change per line) for incremental parsing"""
+    last_sync = None
+    if since:
+        try:
+            last_sync = datetime.fromisoformat(since.replace('Z', '+00:00'))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        sync_manager.stream_server_changes(client_id, last_sync, since_record_id),
+        media_type="application/x-ndjson"
+    )
+
 @sync_router.post("/ping")
 async def sync_ping(client_info: Dict[str, Any]):
     """Ping endpoint for clients to check connectivity and register"""
     try:
         client_id = client_info.get('client_id', str(uuid.uuid4()))
         
-        # Update client info in database
-        await db_manager.execute(
-            """
-            INSERT INTO sync_status (id, table_name, record_id, operation, client_id, synced, created_at)
-            VALUES ($1, 'ping', 'ping', 'PING', $2, true, CURRENT_TIMESTAMP)
-            """,
-            str(uuid.uuid4()), client_id
-        )
+        # Update client info in database (coalesced with concurrent pings)
+        await ping_batcher.process(client_id)
         
         return {
             "pong": True,
             "client_id": client_id,
-            "server_time": datetime.now().isoformat(),
+            "server_time": datetime.now(timezone.utc).isoformat(),
             "sync_available": True
         }
         
@@ -419,5 +977,5 @@ async def sync_ping(client_info: Dict[str, Any]):
         return {
             "pong": False,
             "error": str(e),
-            "server_time": datetime.now().isoformat()
+            "server_time": datetime.now(timezone.utc).isoformat()
         }
\ No newline at end of file
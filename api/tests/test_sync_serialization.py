@@ -0,0 +1,53 @@
+"""
+Serialization tests for server changes returned by the sync endpoints
+"""
+
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import orjson
+import ormsgpack
+from starlette.requests import Request
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sync_endpoints import SyncManager, negotiated_response, MSGPACK_MEDIA_TYPE
+
+class RecordUUID(uuid.UUID):
+    """Stands in for asyncpg's UUID subclass, which orjson refuses to serialize"""
+
+def _change_rows():
+    record_id = RecordUUID(int=42)
+    return [{
+        'table_name': 'work_orders',
+        'operation': 'UPDATE',
+        'record_id': record_id,
+        'updated_at': datetime(2024, 1, 1, tzinfo=timezone.utc),
+        'data': orjson.dumps({'id': str(record_id), 'title': 'Pump check'}).decode()
+    }]
+
+def _request(accept: str) -> Request:
+    return Request({'type': 'http', 'headers': [(b'accept', accept.encode())]})
+
+def test_changes_serialize_as_json():
+    changes = [SyncManager._row_to_change(row) for row in _change_rows()]
+    response = negotiated_response(_request('application/json'), {'server_changes': changes})
+    
+    body = orjson.loads(response.body)
+    assert body['server_changes'][0]['record_id'] == str(uuid.UUID(int=42))
+    assert body['server_changes'][0]['data']['title'] == 'Pump check'
+
+def test_changes_serialize_as_msgpack():
+    changes = [SyncManager._row_to_change(row) for row in _change_rows()]
+    response = negotiated_response(_request(MSGPACK_MEDIA_TYPE), {'server_changes': changes})
+    
+    body = ormsgpack.unpackb(response.body)
+    assert body['server_changes'][0]['record_id'] == str(uuid.UUID(int=42))
+    assert body['server_changes'][0]['data']['title'] == 'Pump check'
+
+def test_change_stream_lines_serialize():
+    line = orjson.dumps(SyncManager._row_to_change(_change_rows()[0]))
+    assert orjson.loads(line)['record_id'] == str(uuid.UUID(int=42))
@@ -5,74 +5,321 @@ Handles automated backups, point-in-time recovery, and disaster recovery
 
 import asyncio
 import asyncpg
+from asyncpg import Pool
 import os
 import subprocess
 import shutil
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import json
 import gzip
 import tarfile
+import io
+import tempfile
+import re
 
 from .config import DatabaseConfig
 
 logger = logging.getLogger(__name__)
 
+def _parse_created_at(value: str) -> datetime:
+    """Parse a metadata timestamp as an aware UTC datetime (older metadata used naive local time)"""
+    parsed = datetime.fromisoformat(value)
+    return parsed.astimezone(timezone.utc)
+
+def _quote_ident(name: str) -> str:
+    """Quote a table name for use in SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _safe_unlink(path: Path) -> None:
+    """Remove a backup file (or base backup directory), ignoring ones that are already gone"""
+    try:
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    except FileNotFoundError:
+        pass
+
+# First pg_dump major version with zstd compression (--compress=zstd:N)
+PG_DUMP_ZSTD_MIN_VERSION = 16
+
+# gzip level for legacy .sql.gz backups (9 is much slower for little gain)
+GZIP_COMPRESS_LEVEL = 6
+
+# Bytes moved per read when streaming a gzip file into a subprocess (also the
+# read buffer of the compressed file, so inflate works on large blocks)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# zstd level for the cold tier (slow to compress, as fast as level 3 to decompress)
+COLD_ZSTD_LEVEL = 19
+
+# Tables dumped in parallel by pg_dump --format=directory
+DUMP_PARALLEL_JOBS = min(os.cpu_count() or 1, 4)
+
+# Backups removed concurrently during cleanup
+CLEANUP_CONCURRENCY = 8
+
+# Tables copied concurrently by logical table backups and restores
+TABLE_COPY_CONCURRENCY = 4
+
+# Physical backups taken with pg_basebackup (restored via combine_backups, not restore_backup)
+BASE_BACKUP_TYPES = ('base', 'incremental')
+
+class _CountingIO(io.RawIOBase):
+    """Write-through wrapper that counts the bytes written"""
+    
+    def __init__(self, inner):
+        self.inner = inner
+        self.count = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self.count
+    
+    def write(self, b) -> int:
+        written = self.inner.write(b)
+        self.count += written
+        return written
+
 class BackupManager:
     """Manages database backups and recovery operations"""
     
     def __init__(self, config: Optional[DatabaseConfig] = None):
-        self.config = config or DatabaseConfig()
+        self.config = config or DatabaseConfig.from_env()
         self.backup_dir = Path(os.getenv('BACKUP_DIR', '/var/backups/chatterfix'))
         self.retention_days = int(os.getenv('BACKUP_RETENTION_DAYS', '30'))
         self.max_backups = int(os.getenv('MAX_BACKUPS', '100'))
+        # 'zstd' (default) or 'gzip' for the legacy .sql.gz output
+        self.compression_algo = os.getenv('COMPRESSION_ALGO', 'zstd').lower()
+        # Plain-format backups older than this are recompressed for the cold tier
+        self.cold_after_days = int(os.getenv('BACKUP_COLD_AFTER_DAYS', '7'))
+        # Parallel pg_restore jobs for archive-format (custom/directory) backups
+        self.restore_jobs = int(os.getenv('RESTORE_JOBS', '4'))
+        
+        # Parsed metadata files: path -> (mtime, metadata, parsed created_at)
+        self._meta_cache: Dict[Path, Tuple[float, Dict[str, Any], datetime]] = {}
+        
+        # Pool on the 'postgres' admin database, created on first use
+        self._admin_pool: Optional[Pool] = None
+        self._admin_lock = asyncio.Lock()
         
         # Ensure backup directory exists
         self.backup_dir.mkdir(parents=True, exist_ok=True)
     
+    async def _admin(self) -> Pool:
+        """Shared connection pool on the 'postgres' admin database"""
+        if self._admin_pool is None:
+            async with self._admin_lock:
+                if self._admin_pool is None:
+                    self._admin_pool = await asyncpg.create_pool(
+                        host=self.config.host,
+                        port=self.config.port,
+                        database='postgres',
+                        user=self.config.username,
+                        password=self.config.password,
+                        min_size=1,
+                        max_size=2
+                    )
+        return self._admin_pool
+    
+    async def close(self) -> None:
+        """Close the admin connection pool"""
+        if self._admin_pool is not None:
+            await self._admin_pool.close()
+            self._admin_pool = None
+    
+    def _write_metadata(self, metadata_file: Path, metadata: Dict[str, Any]) -> None:
+        """Write metadata atomically so readers never see a partially written file"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.backup_dir, prefix=metadata_file.name, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(metadata, f, separators=(',', ':'))
+            os.replace(tmp_path, metadata_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    
+    @staticmethod
+    def _tar_directory(source_dir: Path, tar_file: Path) -> int:
+        """Pack a pg_dump directory into an uncompressed tar (its files are already
+        compressed); returns the size of the tar file"""
+        with open(tar_file, 'wb') as f:
+            counter = _CountingIO(f)
+            with tarfile.open(fileobj=counter, mode='w') as tar:
+                tar.add(source_dir, arcname=source_dir.name)
+        return counter.count
+    
+    @staticmethod
+    def _extract_tar(tar_file: Path, target_dir: Path) -> None:
+        with tarfile.open(tar_file, 'r') as tar:
+            tar.extractall(target_dir)
+    
+    async def _run_command(self, cmd: List[str], env: Optional[Dict[str, str]] = None) -> bytes:
+        """Run a command without blocking the event loop; raises CalledProcessError on failure"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        output, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, output=output, stderr=stderr)
+        return output or b''
+    
+    async def _pg_dump_major_version(self) -> int:
+        """Major version of the installed pg_dump (0 if it cannot be determined)"""
+        try:
+            output = (await self._run_command(['pg_dump', '--version'])).decode()
+        except (OSError, subprocess.CalledProcessError):
+            return 0
+        
+        match = re.search(r'(\d+)', output)
+        return int(match.group(1)) if match else 0
+    
+    async def _run_pipeline(self, producer_cmd: List[str], consumer_cmd: List[str], env: Dict[str, str]) -> None:
+        """Run producer_cmd | consumer_cmd; the data flows between the processes, not through Python"""
+        read_fd, write_fd = os.pipe()
+        try:
+            producer = await asyncio.create_subprocess_exec(
+                *producer_cmd,
+                stdout=write_fd,
+                stderr=asyncio.subprocess.PIPE,
+                env=env
+            )
+            try:
+                consumer = await asyncio.create_subprocess_exec(
+                    *consumer_cmd,
+                    stdin=read_fd,
+                    stderr=asyncio.subprocess.PIPE,
+                    env=env
+                )
+            except Exception:
+                producer.kill()
+                await producer.wait()
+                raise
+        finally:
+            # The children hold their own copies; closing ours lets EOF reach the consumer
+            os.close(read_fd)
+            os.close(write_fd)
+        
+        (_, producer_stderr), (_, consumer_stderr) = await asyncio.gather(
+            producer.communicate(), consumer.communicate()
+        )
+        
+        for process, cmd, stderr in (
+            (producer, producer_cmd, producer_stderr),
+            (consumer, consumer_cmd, consumer_stderr)
+        ):
+            if process.returncode != 0:
+                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+    
+    async def _restore_from_gzip(self, cmd: List[str], backup_file: Path, env: Dict[str, str]) -> None:
+        """Feed the decompressed contents of backup_file to cmd's stdin"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        stderr_task = asyncio.create_task(process.stderr.read())
+        
+        try:
+            with open(backup_file, 'rb', buffering=STREAM_CHUNK_SIZE) as raw, \
+                    gzip.GzipFile(fileobj=raw, mode='rb') as f:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The process exited early; its return code and stderr explain why
+            pass
+        finally:
+            process.stdin.close()
+        
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+    
     async def create_full_backup(self, backup_name: Optional[str] = None) -> Dict[str, Any]:
         """Create a full database backup using pg_dump"""
+        now = datetime.now(timezone.utc)
         if not backup_name:
-            backup_name = f"chatterfix_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            backup_name = f"chatterfix_backup_{now.strftime('%Y%m%d_%H%M%S')}"
+        
+        # Directory format dumped by parallel pg_dump jobs and compressed per table
+        # (restorable in parallel with pg_restore --jobs), stored as one uncompressed
+        # tar; older pg_dump without zstd streams plain SQL through multithreaded zstd.
+        # COMPRESSION_ALGO=gzip keeps the legacy .sql.gz output.
+        if self.compression_algo == 'gzip':
+            backup_format, compression, suffix = 'plain', 'gzip', '.sql.gz'
+        elif await self._pg_dump_major_version() >= PG_DUMP_ZSTD_MIN_VERSION:
+            backup_format, compression, suffix = 'directory', 'zstd:3', '.tar'
+        else:
+            backup_format, compression, suffix = 'plain', 'zstd:3', '.sql.zst'
         
-        backup_file = self.backup_dir / f"{backup_name}.sql.gz"
+        backup_file = self.backup_dir / f"{backup_name}{suffix}"
         
         try:
             logger.info(f"Starting full backup: {backup_name}")
             
-            # Build pg_dump command
+            # Build pg_dump command (never with --inserts: table data is written as
+            # COPY blocks, which restore far faster than row-by-row INSERTs)
             pg_dump_cmd = [
                 'pg_dump',
                 '--host', self.config.host,
                 '--port', str(self.config.port),
                 '--username', self.config.username,
-                '--dbname', self.config.database,
-                '--verbose',
-                '--clean',
-                '--if-exists',
-                '--create',
-                '--format=plain'
+                '--dbname', self.config.database
             ]
             
             # Set password via environment variable
             env = os.environ.copy()
             env['PGPASSWORD'] = self.config.password
             
-            # Run pg_dump and compress output
-            with gzip.open(backup_file, 'wt') as f:
-                process = subprocess.run(
+            if backup_format == 'directory':
+                # --clean/--create are restore-time options for archive formats
+                with tempfile.TemporaryDirectory(dir=self.backup_dir, prefix=f"{backup_name}_") as work_dir:
+                    dump_dir = Path(work_dir) / backup_name
+                    pg_dump_cmd += [
+                        '--format=directory',
+                        f'--jobs={DUMP_PARALLEL_JOBS}',
+                        '--compress=zstd:3',
+                        '--file', str(dump_dir)
+                    ]
+                    await self._run_command(pg_dump_cmd, env)
+                    backup_size = await asyncio.to_thread(self._tar_directory, dump_dir, backup_file)
+            elif compression == 'zstd:3':
+                pg_dump_cmd += ['--clean', '--if-exists', '--create', '--format=plain']
+                
+                # Compress on all cores while pg_dump is still producing output
+                await self._run_pipeline(
                     pg_dump_cmd,
-                    stdout=f,
-                    stderr=subprocess.PIPE,
-                    env=env,
-                    check=True,
-                    text=True
+                    ['zstd', '-T0', '-3', '-q', '-f', '-o', str(backup_file)],
+                    env
                 )
+            else:
+                pg_dump_cmd += [
+                    '--verbose', '--clean', '--if-exists', '--create', '--format=plain',
+                    '--compress', str(GZIP_COMPRESS_LEVEL), '--file', str(backup_file)
+                ]
+                
+                # pg_dump compresses and writes the file itself
+                await self._run_command(pg_dump_cmd, env)
             
-            # Get backup file size
-            backup_size = backup_file.stat().st_size
+            # Get backup file size (counted while writing the tar; the other
+            # formats are written by pg_dump/zstd, so stat the finished file)
+            if backup_format != 'directory':
+                backup_size = backup_file.stat().st_size
             
             # Create backup metadata
             metadata = {
@@ -80,24 +327,27 @@ class BackupManager:
                 'backup_file': str(backup_file),
                 'backup_size': backup_size,
                 'backup_size_mb': round(backup_size / 1024 / 1024, 2),
-                'created_at': datetime.now().isoformat(),
+                'created_at': now.isoformat(),
                 'database': self.config.database,
                 'host': self.config.host,
                 'backup_type': 'full',
-                'compression': 'gzip'
+                'format': backup_format,
+                'compression': compression
             }
+            if backup_format == 'directory':
+                metadata['parallel_jobs'] = DUMP_PARALLEL_JOBS
             
             # Save metadata
             metadata_file = self.backup_dir / f"{backup_name}.metadata.json"
-            with open(metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            self._write_metadata(metadata_file, metadata)
             
             logger.info(f"Backup completed: {backup_file} ({metadata['backup_size_mb']} MB)")
             
             return metadata
             
         except subprocess.CalledProcessError as e:
-            error_msg = f"pg_dump failed: {e.stderr.decode() if e.stderr else str(e)}"
+            stderr = e.stderr.decode() if isinstance(e.stderr, bytes) else e.stderr
+            error_msg = f"pg_dump failed: {stderr or str(e)}"
             logger.error(error_msg)
             
             # Clean up failed backup file
@@ -112,7 +362,8 @@ class BackupManager:
     
     async def create_schema_only_backup(self) -> Dict[str, Any]:
         """Create a schema-only backup for structure comparison"""
-        backup_name = f"schema_only_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        now = datetime.now(timezone.utc)
+        backup_name = f"schema_only_{now.strftime('%Y%m%d_%H%M%S')}"
         backup_file = self.backup_dir / f"{backup_name}.sql"
         
         try:
@@ -125,36 +376,280 @@ class BackupManager:
                 '--schema-only',
                 '--clean',
                 '--if-exists',
-                '--create'
+                '--create',
+                '--file', str(backup_file)
             ]
             
             env = os.environ.copy()
             env['PGPASSWORD'] = self.config.password
             
-            with open(backup_file, 'w') as f:
-                subprocess.run(
-                    pg_dump_cmd,
-                    stdout=f,
-                    env=env,
-                    check=True
-                )
+            await self._run_command(pg_dump_cmd, env)
             
             return {
                 'backup_name': backup_name,
                 'backup_file': str(backup_file),
                 'backup_type': 'schema_only',
-                'created_at': datetime.now().isoformat()
+                'created_at': now.isoformat()
             }
             
         except Exception as e:
             logger.error(f"Schema backup failed: {e}")
             raise
     
+    async def create_logical_table_backup(self, tables: List[str], backup_name: Optional[str] = None) -> Dict[str, Any]:
+        """Back up tables with binary COPY over asyncpg, in parallel from one snapshot.
+        
+        Only the table definitions (before and after the data) come from pg_dump;
+        restore_backup loads the data back with binary COPY as well.
+        """
+        now = datetime.now(timezone.utc)
+        if not backup_name:
+            backup_name = f"chatterfix_tables_{now.strftime('%Y%m%d_%H%M%S')}"
+        backup_path = self.backup_dir / backup_name
+        backup_path.mkdir()
+        
+        try:
+            logger.info(f"Starting logical table backup: {backup_name}")
+            
+            env = os.environ.copy()
+            env['PGPASSWORD'] = self.config.password
+            
+            # Tables (pre-data) and their constraints/indexes (post-data), so a restore
+            # can load the data in between without foreign key ordering issues
+            schema_cmd = [
+                'pg_dump',
+                '--host', self.config.host,
+                '--port', str(self.config.port),
+                '--username', self.config.username,
+                '--dbname', self.config.database,
+                *(f'--table={table}' for table in tables)
+            ]
+            for section in ('pre-data', 'post-data'):
+                await self._run_command(
+                    schema_cmd + [f'--section={section}', '--file', str(backup_path / f'{section}.sql')],
+                    env
+                )
+            
+            pool = await asyncpg.create_pool(
+                host=self.config.host,
+                port=self.config.port,
+                database=self.config.database,
+                user=self.config.username,
+                password=self.config.password,
+                min_size=1,
+                max_size=TABLE_COPY_CONCURRENCY + 1
+            )
+            try:
+                async with pool.acquire() as leader, leader.transaction(isolation='repeatable_read', readonly=True):
+                    # Every table is copied from the leader's snapshot, so the backup is consistent
+                    snapshot = await leader.fetchval("SELECT pg_export_snapshot()")
+                    semaphore = asyncio.Semaphore(TABLE_COPY_CONCURRENCY)
+                    
+                    async def copy_table(table: str) -> None:
+                        async with semaphore, pool.acquire() as conn:
+                            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                                await conn.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}'")
+                                await conn.copy_from_query(
+                                    f"SELECT * FROM {_quote_ident(table)}",
+                                    output=str(backup_path / f"{table}.copy"),
+                                    format='binary'
+                                )
+                    
+                    await asyncio.gather(*(copy_table(table) for table in tables))
+            finally:
+                await pool.close()
+            
+            with os.scandir(backup_path) as it:
+                backup_size = sum(entry.stat().st_size for entry in it if entry.is_file())
+            
+            metadata = {
+                'backup_name': backup_name,
+                'backup_file': str(backup_path),
+                'backup_size': backup_size,
+                'backup_size_mb': round(backup_size / 1024 / 1024, 2),
+                'created_at': now.isoformat(),
+                'database': self.config.database,
+                'host': self.config.host,
+                'backup_type': 'logical_tables',
+                'format': 'copy_binary',
+                'compression': 'none',
+                'tables': tables
+            }
+            
+            self._write_metadata(self.backup_dir / f"{backup_name}.metadata.json", metadata)
+            
+            logger.info(f"Logical table backup completed: {backup_path} ({metadata['backup_size_mb']} MB)")
+            return metadata
+            
+        except Exception as e:
+            logger.error(f"Logical table backup failed: {e}")
+            
+            # Clean up failed backup directory
+            await asyncio.to_thread(_safe_unlink, backup_path)
+            raise
+    
+    async def _restore_logical_tables(
+        self,
+        metadata: Dict[str, Any],
+        backup_path: Path,
+        target_database: str,
+        psql_cmd: List[str],
+        env: Dict[str, str]
+    ) -> None:
+        """Create the tables, load them with binary COPY in parallel, then add constraints and indexes"""
+        await self._run_command(psql_cmd + ['--file', str(backup_path / 'pre-data.sql')], env)
+        
+        pool = await asyncpg.create_pool(
+            host=self.config.host,
+            port=self.config.port,
+            database=target_database,
+            user=self.config.username,
+            password=self.config.password,
+            min_size=1,
+            max_size=TABLE_COPY_CONCURRENCY
+        )
+        try:
+            async def load_table(table: str) -> None:
+                async with pool.acquire() as conn:
+                    await conn.copy_to_table(
+                        table,
+                        source=str(backup_path / f"{table}.copy"),
+                        format='binary'
+                    )
+            
+            await asyncio.gather(*(load_table(table) for table in metadata['tables']))
+        finally:
+            await pool.close()
+        
+        await self._run_command(psql_cmd + ['--file', str(backup_path / 'post-data.sql')], env)
+    
+    async def create_base_backup(self, incremental_from: Optional[Path] = None) -> Dict[str, Any]:
+        """Create a physical backup with pg_basebackup (needs a REPLICATION role).
+        
+        With incremental_from (the backup_manifest of an earlier base backup) only pages
+        changed since that backup are copied; this requires PostgreSQL 17 with
+        summarize_wal enabled.
+        """
+        backup_type = 'incremental' if incremental_from else 'base'
+        now = datetime.now(timezone.utc)
+        backup_name = f"chatterfix_{backup_type}_{now.strftime('%Y%m%d_%H%M%S')}"
+        backup_path = self.backup_dir / backup_name
+        
+        try:
+            logger.info(f"Starting {backup_type} backup: {backup_name}")
+            
+            basebackup_cmd = [
+                'pg_basebackup',
+                '--host', self.config.host,
+                '--port', str(self.config.port),
+                '--username', self.config.username,
+                '--pgdata', str(backup_path),
+                '--format=tar',
+                '--compress=server-zstd:3',
+                '--checkpoint=fast'
+            ]
+            if incremental_from:
+                basebackup_cmd.append(f'--incremental={incremental_from}')
+            
+            env = os.environ.copy()
+            env['PGPASSWORD'] = self.config.password
+            
+            await self._run_command(basebackup_cmd, env)
+            
+            with os.scandir(backup_path) as it:
+                backup_size = sum(entry.stat().st_size for entry in it if entry.is_file())
+            
+            metadata = {
+                'backup_name': backup_name,
+                'backup_file': str(backup_path),
+                'backup_size': backup_size,
+                'backup_size_mb': round(backup_size / 1024 / 1024, 2),
+                'created_at': now.isoformat(),
+                'database': self.config.database,
+                'host': self.config.host,
+                'backup_type': backup_type,
+                'format': 'tar',
+                'compression': 'server-zstd:3',
+                'manifest': str(backup_path / 'backup_manifest'),
+                'incremental_from': str(incremental_from) if incremental_from else None
+            }
+            
+            self._write_metadata(self.backup_dir / f"{backup_name}.metadata.json", metadata)
+            
+            logger.info(f"{backup_type.capitalize()} backup completed: {backup_path} ({metadata['backup_size_mb']} MB)")
+            return metadata
+            
+        except subprocess.CalledProcessError as e:
+            error_msg = f"pg_basebackup failed: {e.stderr.decode() if e.stderr else str(e)}"
+            logger.error(error_msg)
+            
+            # Clean up failed backup directory
+            await asyncio.to_thread(_safe_unlink, backup_path)
+            
+            raise Exception(error_msg)
+        
+        except Exception as e:
+            logger.error(f"Base backup failed: {e}")
+            raise
+    
+    async def combine_backups(self, backup_names: List[str], output_dir: Path) -> Dict[str, Any]:
+        """Reconstruct a data directory from a base backup and its incrementals (oldest first).
+        
+        Start a PostgreSQL server on output_dir to restore it.
+        """
+        with tempfile.TemporaryDirectory(dir=self.backup_dir, prefix='combine_') as work_dir:
+            # pg_combinebackup works on plain directories, so unpack the tar backups first
+            extracted = []
+            for backup_name in backup_names:
+                with open(self.backup_dir / f"{backup_name}.metadata.json", 'r') as f:
+                    metadata = json.load(f)
+                if metadata.get('backup_type') not in BASE_BACKUP_TYPES:
+                    raise ValueError(f"{backup_name} is not a base backup")
+                
+                backup_path = Path(metadata['backup_file'])
+                target = Path(work_dir) / backup_name
+                (target / 'pg_wal').mkdir(parents=True)
+                
+                await self._run_command(
+                    ['tar', '--use-compress-program=zstd', '-xf', str(backup_path / 'base.tar.zst'), '-C', str(target)]
+                )
+                wal_archive = backup_path / 'pg_wal.tar.zst'
+                if wal_archive.exists():
+                    await self._run_command(
+                        ['tar', '--use-compress-program=zstd', '-xf', str(wal_archive), '-C', str(target / 'pg_wal')]
+                    )
+                await asyncio.to_thread(shutil.copy2, backup_path / 'backup_manifest', target / 'backup_manifest')
+                extracted.append(str(target))
+            
+            try:
+                await self._run_command(['pg_combinebackup', '--output', str(output_dir), *extracted])
+            except subprocess.CalledProcessError as e:
+                error_msg = f"pg_combinebackup failed: {e.stderr.decode() if e.stderr else str(e)}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+        
+        logger.info(f"Combined {len(backup_names)} backups into {output_dir}")
+        return {
+            'backup_names': backup_names,
+            'output_dir': str(output_dir),
+            'combined_at': datetime.now(timezone.utc).isoformat()
+        }
+    
     async def restore_backup(self, backup_name: str, target_db: Optional[str] = None) -> Dict[str, Any]:
         """Restore a database backup"""
-        backup_file = self.backup_dir / f"{backup_name}.sql.gz"
         metadata_file = self.backup_dir / f"{backup_name}.metadata.json"
         
+        # Load metadata
+        metadata = {}
+        if metadata_file.exists():
+            with open(metadata_file, 'r') as f:
+                metadata = json.load(f)
+        
+        if metadata.get('backup_type') in BASE_BACKUP_TYPES:
+            raise ValueError(f"{backup_name} is a physical backup; use combine_backups to restore it")
+        
+        backup_file = Path(metadata.get('backup_file') or self.backup_dir / f"{backup_name}.sql.gz")
+        
         if not backup_file.exists():
             raise FileNotFoundError(f"Backup file not found: {backup_file}")
         
@@ -163,11 +658,8 @@ class BackupManager:
         try:
             logger.info(f"Starting restore: {backup_name} to {target_database}")
             
-            # Load metadata
-            metadata = {}
-            if metadata_file.exists():
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
+            env = os.environ.copy()
+            env['PGPASSWORD'] = self.config.password
             
             # Build psql command for restore
             psql_cmd = [
@@ -179,28 +671,50 @@ class BackupManager:
                 '--quiet'
             ]
             
-            env = os.environ.copy()
-            env['PGPASSWORD'] = self.config.password
-            
-            # Restore from compressed backup
-            with gzip.open(backup_file, 'rt') as f:
-                process = subprocess.run(
-                    psql_cmd,
-                    stdin=f,
-                    stderr=subprocess.PIPE,
-                    env=env,
-                    text=True
-                )
-            
-            if process.returncode != 0:
-                error_msg = f"psql restore failed: {process.stderr}"
+            try:
+                # pg_restore loads table data with COPY FROM STDIN, one table per job;
+                # no --single-transaction, which would rule out parallel jobs
+                if metadata.get('format') == 'directory':
+                    # Unpack the dump directory, then load its tables in parallel
+                    with tempfile.TemporaryDirectory(dir=self.backup_dir, prefix=f"{backup_name}_") as work_dir:
+                        await asyncio.to_thread(self._extract_tar, backup_file, Path(work_dir))
+                        await self._run_command([
+                            'pg_restore',
+                            '--host', self.config.host,
+                            '--port', str(self.config.port),
+                            '--username', self.config.username,
+                            '--dbname', target_database,
+                            f'--jobs={self.restore_jobs}',
+                            str(Path(work_dir) / backup_name)
+                        ], env)
+                elif metadata.get('format') == 'copy_binary':
+                    await self._restore_logical_tables(metadata, backup_file, target_database, psql_cmd, env)
+                elif metadata.get('format') == 'custom':
+                    # pg_restore loads tables in parallel
+                    await self._run_command([
+                        'pg_restore',
+                        '--host', self.config.host,
+                        '--port', str(self.config.port),
+                        '--username', self.config.username,
+                        '--dbname', target_database,
+                        f'--jobs={self.restore_jobs}',
+                        str(backup_file)
+                    ], env)
+                elif metadata.get('compression', '').startswith('zstd'):
+                    # Decompress on a separate process straight into psql
+                    await self._run_pipeline(['zstd', '-dcq', str(backup_file)], psql_cmd, env)
+                else:
+                    # Restore from compressed backup
+                    await self._restore_from_gzip(psql_cmd, backup_file, env)
+            except subprocess.CalledProcessError as e:
+                error_msg = f"{e.cmd[0]} restore failed: {e.stderr.decode() if e.stderr else str(e)}"
                 logger.error(error_msg)
                 raise Exception(error_msg)
             
             restore_result = {
                 'backup_name': backup_name,
                 'target_database': target_database,
-                'restored_at': datetime.now().isoformat(),
+                'restored_at': datetime.now(timezone.utc).isoformat(),
                 'original_backup_date': metadata.get('created_at'),
                 'success': True
             }
@@ -212,20 +726,54 @@ class BackupManager:
             logger.error(f"Restore failed: {e}")
             raise
     
+    def _scan_backup_dir(self) -> Dict[str, os.DirEntry]:
+        """Entries of the backup directory by file name (each entry caches its stat())"""
+        with os.scandir(self.backup_dir) as it:
+            return {entry.name: entry for entry in it}
+    
+    def _backup_file_entry(self, backup_file: Path, entries: Dict[str, os.DirEntry]) -> Optional[os.DirEntry]:
+        """Directory entry of a backup file, None if it is missing or outside the backup directory"""
+        if backup_file.parent != self.backup_dir:
+            return None
+        return entries.get(backup_file.name)
+    
     async def list_backups(self) -> List[Dict[str, Any]]:
         """List all available backups"""
+        backups = self._list_backups(self._scan_backup_dir())
+        for backup in backups:
+            del backup['_parsed_at']
+        return backups
+    
+    def _list_backups(self, entries: Dict[str, os.DirEntry]) -> List[Dict[str, Any]]:
+        """Backups newest first, each with its parsed creation time under '_parsed_at'"""
         backups = []
+        seen = set()
+        now = datetime.now(timezone.utc)
         
-        for metadata_file in self.backup_dir.glob("*.metadata.json"):
+        for name, entry in entries.items():
+            if not name.endswith('.metadata.json'):
+                continue
+            metadata_file = Path(entry.path)
             try:
-                with open(metadata_file, 'r') as f:
-                    metadata = json.load(f)
+                # Only re-read metadata files that changed since they were last parsed
+                mtime = entry.stat().st_mtime
+                cached = self._meta_cache.get(metadata_file)
+                if cached is None or cached[0] != mtime:
+                    with open(metadata_file, 'r') as f:
+                        metadata = json.load(f)
+                    cached = (mtime, metadata, _parse_created_at(metadata['created_at']))
+                    self._meta_cache[metadata_file] = cached
+                seen.add(metadata_file)
+                
+                _, cached_metadata, created_at = cached
+                metadata = dict(cached_metadata)
+                metadata['_parsed_at'] = created_at
                 
                 # Check if backup file still exists
                 backup_file = Path(metadata['backup_file'])
-                if backup_file.exists():
+                if self._backup_file_entry(backup_file, entries) or backup_file.exists():
                     metadata['exists'] = True
-                    metadata['age_days'] = (datetime.now() - datetime.fromisoformat(metadata['created_at'])).days
+                    metadata['age_days'] = (now - created_at).days
                     backups.append(metadata)
                 else:
                     metadata['exists'] = False
@@ -234,70 +782,186 @@ class BackupManager:
             except Exception as e:
                 logger.warning(f"Error reading backup metadata {metadata_file}: {e}")
         
+        # Forget metadata files that no longer exist
+        for metadata_file in self._meta_cache.keys() - seen:
+            del self._meta_cache[metadata_file]
+        
         # Sort by creation date, newest first
-        backups.sort(key=lambda x: x['created_at'], reverse=True)
+        backups.sort(key=lambda backup: backup['_parsed_at'], reverse=True)
         return backups
     
     async def cleanup_old_backups(self) -> Dict[str, Any]:
         """Remove old backups based on retention policy"""
         removed_backups = []
         total_size_freed = 0
+        now = datetime.now(timezone.utc)
         
         try:
-            backups = await self.list_backups()
+            # One directory scan serves the listing and the file size lookups
+            entries = self._scan_backup_dir()
+            backups = self._list_backups(entries)
             
             # Remove backups older than retention period
-            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+            cutoff_date = now - timedelta(days=self.retention_days)
             
-            for backup in backups:
-                backup_date = datetime.fromisoformat(backup['created_at'])
+            # Backups are sorted newest first: keep the newest max_backups,
+            # dropping any of those that are past the retention period
+            to_remove = backups[self.max_backups:] + [
+                backup for backup in backups[:self.max_backups]
+                if backup['_parsed_at'] < cutoff_date
+            ]
+            
+            # Never remove a base backup that a kept incremental backup builds on
+            removed_names = {backup['backup_name'] for backup in to_remove}
+            required_manifests = {
+                backup['incremental_from'] for backup in backups
+                if backup.get('incremental_from') and backup['backup_name'] not in removed_names
+            }
+            to_remove = [backup for backup in to_remove if backup.get('manifest') not in required_manifests]
+            
+            semaphore = asyncio.Semaphore(CLEANUP_CONCURRENCY)
+            
+            async def remove_backup(backup: Dict[str, Any]) -> int:
+                backup_file = Path(backup['backup_file'])
+                metadata_file = self.backup_dir / f"{backup['backup_name']}.metadata.json"
                 
-                # Remove if too old or if we have too many backups
-                should_remove = (
-                    backup_date < cutoff_date or 
-                    len(backups) > self.max_backups
-                )
+                # Get file size before deletion
+                entry = self._backup_file_entry(backup_file, entries)
+                if backup.get('backup_type') in BASE_BACKUP_TYPES or (entry is not None and entry.is_dir()):
+                    # Backup directories: use the size recorded when they were written
+                    file_size = backup.get('backup_size', 0)
+                elif entry is not None:
+                    file_size = entry.stat().st_size
+                else:
+                    file_size = backup_file.stat().st_size if backup_file.exists() else 0
+                
+                # Remove files in threads; removes can be slow on network filesystems
+                async with semaphore:
+                    await asyncio.gather(
+                        asyncio.to_thread(_safe_unlink, backup_file),
+                        asyncio.to_thread(_safe_unlink, metadata_file)
+                    )
                 
-                if should_remove and backup['exists']:
-                    try:
-                        backup_file = Path(backup['backup_file'])
-                        metadata_file = self.backup_dir / f"{backup['backup_name']}.metadata.json"
-                        
-                        # Get file size before deletion
-                        file_size = backup_file.stat().st_size if backup_file.exists() else 0
-                        
-                        # Remove files
-                        if backup_file.exists():
-                            backup_file.unlink()
-                        if metadata_file.exists():
-                            metadata_file.unlink()
-                        
-                        removed_backups.append({
-                            'backup_name': backup['backup_name'],
-                            'created_at': backup['created_at'],
-                            'size_mb': round(file_size / 1024 / 1024, 2)
-                        })
-                        
-                        total_size_freed += file_size
-                        logger.info(f"Removed old backup: {backup['backup_name']}")
-                        
-                    except Exception as e:
-                        logger.error(f"Error removing backup {backup['backup_name']}: {e}")
+                logger.info(f"Removed old backup: {backup['backup_name']}")
+                return file_size
+            
+            removable = [backup for backup in to_remove if backup['exists']]
+            results = await asyncio.gather(
+                *(remove_backup(backup) for backup in removable),
+                return_exceptions=True
+            )
+            
+            for backup, result in zip(removable, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error removing backup {backup['backup_name']}: {result}")
+                    continue
+                
+                removed_backups.append({
+                    'backup_name': backup['backup_name'],
+                    'created_at': backup['created_at'],
+                    'size_mb': round(result / 1024 / 1024, 2)
+                })
+                total_size_freed += result
             
             return {
                 'removed_backups': removed_backups,
                 'total_removed': len(removed_backups),
                 'total_size_freed_mb': round(total_size_freed / 1024 / 1024, 2),
-                'cleanup_date': datetime.now().isoformat()
+                'cleanup_date': now.isoformat()
             }
             
         except Exception as e:
             logger.error(f"Backup cleanup failed: {e}")
             return {'error': str(e)}
     
+    async def archive_cold_backups(self, older_than_days: Optional[int] = None) -> Dict[str, Any]:
+        """Recompress plain-format backups older than the cold threshold with zstd -19.
+        
+        Archive formats (directory/custom) are skipped: their table data is already
+        compressed inside the archive.
+        """
+        older_than_days = self.cold_after_days if older_than_days is None else older_than_days
+        cold_compression = f'zstd:{COLD_ZSTD_LEVEL}'
+        archived_backups = []
+        total_size_saved = 0
+        now = datetime.now(timezone.utc)
+        
+        try:
+            cutoff_date = now - timedelta(days=older_than_days)
+            candidates = [
+                backup for backup in self._list_backups(self._scan_backup_dir())
+                if backup['exists']
+                and backup.get('backup_type') == 'full'
+                and backup.get('format', 'plain') == 'plain'
+                and backup.get('compression') != cold_compression
+                and backup['_parsed_at'] < cutoff_date
+            ]
+            
+            env = os.environ.copy()
+            
+            # One at a time: each zstd already uses every core
+            for backup in candidates:
+                backup_file = Path(backup['backup_file'])
+                metadata_file = self.backup_dir / f"{backup['backup_name']}.metadata.json"
+                cold_file = self.backup_dir / f"{backup['backup_name']}.sql.zst"
+                tmp_file = self.backup_dir / f"{backup['backup_name']}.sql.zst.cold"
+                
+                if backup.get('compression', 'gzip') == 'gzip':
+                    decompress_cmd = ['gzip', '-dc', str(backup_file)]
+                else:
+                    decompress_cmd = ['zstd', '-dcq', str(backup_file)]
+                
+                try:
+                    await self._run_pipeline(
+                        decompress_cmd,
+                        ['zstd', f'-{COLD_ZSTD_LEVEL}', '-T0', '-q', '-f', '-o', str(tmp_file)],
+                        env
+                    )
+                    
+                    old_size = backup['backup_size']
+                    new_size = tmp_file.stat().st_size
+                    os.replace(tmp_file, cold_file)
+                    if backup_file != cold_file:
+                        await asyncio.to_thread(_safe_unlink, backup_file)
+                    
+                    with open(metadata_file, 'r') as f:
+                        metadata = json.load(f)
+                    metadata.update({
+                        'backup_file': str(cold_file),
+                        'backup_size': new_size,
+                        'backup_size_mb': round(new_size / 1024 / 1024, 2),
+                        'compression': cold_compression,
+                        'archived_at': now.isoformat()
+                    })
+                    self._write_metadata(metadata_file, metadata)
+                    
+                    archived_backups.append({
+                        'backup_name': backup['backup_name'],
+                        'size_mb_before': round(old_size / 1024 / 1024, 2),
+                        'size_mb_after': metadata['backup_size_mb']
+                    })
+                    total_size_saved += old_size - new_size
+                    logger.info(f"Archived backup to cold tier: {backup['backup_name']}")
+                    
+                except Exception as e:
+                    await asyncio.to_thread(_safe_unlink, tmp_file)
+                    logger.error(f"Error archiving backup {backup['backup_name']}: {e}")
+            
+            return {
+                'archived_backups': archived_backups,
+                'total_archived': len(archived_backups),
+                'total_size_saved_mb': round(total_size_saved / 1024 / 1024, 2),
+                'archive_date': now.isoformat()
+            }
+            
+        except Exception as e:
+            logger.error(f"Cold backup archiving failed: {e}")
+            return {'error': str(e)}
+    
     async def verify_backup(self, backup_name: str) -> Dict[str, Any]:
         """Verify backup integrity by attempting to restore to a test database"""
-        test_db_name = f"test_restore_{int(datetime.now().timestamp())}"
+        now = datetime.now(timezone.utc)
+        test_db_name = f"test_restore_{int(now.timestamp())}"
         
         try:
             # Create test database
@@ -314,7 +978,7 @@ class BackupManager:
                 'verification_status': 'passed',
                 'restore_successful': True,
                 'table_count': verification_results.get('table_count', 0),
-                'verified_at': datetime.now().isoformat()
+                'verified_at': datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
@@ -323,7 +987,7 @@ class BackupManager:
                 'backup_name': backup_name,
                 'verification_status': 'failed',
                 'error': str(e),
-                'verified_at': datetime.now().isoformat()
+                'verified_at': datetime.now(timezone.utc).isoformat()
             }
         
         finally:
@@ -335,33 +999,13 @@ class BackupManager:
     
     async def _create_test_database(self, db_name: str):
         """Create a temporary database for testing"""
-        admin_conn = await asyncpg.connect(
-            host=self.config.host,
-            port=self.config.port,
-            database='postgres',
-            user=self.config.username,
-            password=self.config.password
-        )
-        
-        try:
+        async with (await self._admin()).acquire() as admin_conn:
             await admin_conn.execute(f'CREATE DATABASE "{db_name}"')
-        finally:
-            await admin_conn.close()
     
     async def _drop_test_database(self, db_name: str):
         """Drop the temporary test database"""
-        admin_conn = await asyncpg.connect(
-            host=self.config.host,
-            port=self.config.port,
-            database='postgres',
-            user=self.config.username,
-            password=self.config.password
-        )
-        
-        try:
+        async with (await self._admin()).acquire() as admin_conn:
             await admin_conn.execute(f'DROP DATABASE IF EXISTS "{db_name}"')
-        finally:
-            await admin_conn.close()
     
     async def _verify_restored_database(self, db_name: str) -> Dict[str, Any]:
         """Verify the structure of a restored database"""
@@ -374,22 +1018,25 @@ class BackupManager:
         )
         
         try:
-            # Count tables
-            table_count = await test_conn.fetchval(
-                "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'public'"
-            )
-            
-            # Check for critical tables
+            # Count tables and check for critical tables in one round trip
             critical_tables = ['users', 'work_orders', 'assets', 'pm_tasks']
-            existing_tables = []
-            
-            for table in critical_tables:
-                exists = await test_conn.fetchval(
-                    "SELECT EXISTS(SELECT 1 FROM information_schema.tables WHERE table_name = $1)",
-                    table
+            row = await test_conn.fetchrow(
+                """
+                WITH public_tables AS (
+                    SELECT table_name::text AS table_name
+                    FROM information_schema.tables WHERE table_schema = 'public'
                 )
-                if exists:
-                    existing_tables.append(table)
+                SELECT
+                    (SELECT COUNT(*) FROM public_tables) AS table_count,
+                    ARRAY(
+                        SELECT table_name FROM public_tables WHERE table_name = ANY($1::text[])
+                    ) AS existing_tables
+                """,
+                critical_tables
+            )
+            table_count = row['table_count']
+            found = set(row['existing_tables'])
+            existing_tables = [table for table in critical_tables if table in found]
             
             return {
                 'table_count': table_count,
@@ -407,34 +1054,84 @@ class BackupScheduler:
     def __init__(self, backup_manager: BackupManager):
         self.backup_manager = backup_manager
         self.daily_backup_hour = int(os.getenv('DAILY_BACKUP_HOUR', '2'))  # 2 AM
+        # Weekly base backup (Sunday) plus daily incrementals with pg_basebackup
+        self.base_backups_enabled = os.getenv('BASE_BACKUPS_ENABLED', 'false').lower() == 'true'
+    
+    async def run_base_backup(self) -> Dict[str, Any]:
+        """Sunday (or when there is no base yet): base backup; other days: incremental from the latest base"""
+        latest_base = next(
+            (backup for backup in await self.backup_manager.list_backups()
+             if backup.get('backup_type') == 'base' and backup['exists']),
+            None
+        )
+        
+        if latest_base is None or datetime.now(timezone.utc).weekday() == 6:
+            return await self.backup_manager.create_base_backup()
+        return await self.backup_manager.create_base_backup(incremental_from=Path(latest_base['manifest']))
     
     async def run_daily_backup(self):
         """Run daily backup routine"""
         try:
             logger.info("Starting daily backup routine...")
             
-            # Create full backup
-            backup_result = await self.backup_manager.create_full_backup()
+            # Create full backup and schema-only backup (for quick structure
+            # comparison) concurrently while the database is warm
+            backups = [
+                self.backup_manager.create_full_backup(),
+                self.backup_manager.create_schema_only_backup()
+            ]
+            if self.base_backups_enabled:
+                backups.append(self.run_base_backup())
+            
+            backup_result, schema_backup, *base_backup = await asyncio.gather(
+                *backups,
+                return_exceptions=True
+            )
+            base_backup = base_backup[0] if base_backup else None
+            
+            # Without a new full backup, leave the existing ones alone
+            if isinstance(backup_result, Exception):
+                raise backup_result
             
-            # Clean up old backups
+            # Clean up old backups (last, so it sees the new full backup)
             cleanup_result = await self.backup_manager.cleanup_old_backups()
             
-            # Create schema-only backup (for quick structure comparison)
-            schema_backup = await self.backup_manager.create_schema_only_backup()
+            # Recompress aged backups for the cold tier (after cleanup, so it never
+            # works on backups that are being removed)
+            archive_result = await self.backup_manager.archive_cold_backups()
             
             logger.info(f"Daily backup completed: {backup_result['backup_name']}")
             logger.info(f"Cleaned up {cleanup_result.get('total_removed', 0)} old backups")
+            logger.info(f"Archived {archive_result.get('total_archived', 0)} backups to the cold tier")
             
-            return {
+            result = {
                 'backup_result': backup_result,
                 'cleanup_result': cleanup_result,
+                'archive_result': archive_result,
                 'schema_backup': schema_backup,
+                'base_backup': base_backup,
                 'success': True
             }
             
+            errors = []
+            for key, label in (('schema_backup', 'Schema-only backup'), ('base_backup', 'Base backup')):
+                if isinstance(result[key], Exception):
+                    logger.error(f"{label} failed: {result[key]}")
+                    errors.append(str(result[key]))
+                    result[key] = None
+            if errors:
+                result['success'] = False
+                result['error'] = '; '.join(errors)
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Daily backup routine failed: {e}")
             return {'success': False, 'error': str(e)}
+        
+        finally:
+            # Runs once a day; don't hold admin connections in between
+            await self.backup_manager.close()
 
 # Initialize backup manager
 backup_manager = BackupManager()
@@ -491,4 +1188,10 @@ if __name__ == "__main__":
             print(f"Unknown command: {command}")
             sys.exit(1)
     
-    asyncio.run(run_command())
\ No newline at end of file
+    async def main():
+        try:
+            await run_command()
+        finally:
+            await backup_manager.close()
+    
+    asyncio.run(main())
\ No newline at end of file
@@ -5,6 +5,9 @@ Production-ready PostgreSQL connection with pooling and async support
 
 import os
 import asyncio
+import functools
+from dataclasses import dataclass, field
+from contextvars import ContextVar
 from typing import Optional, AsyncGenerator
 import asyncpg
 from asyncpg import Pool
@@ -13,28 +16,56 @@ from contextlib import asynccontextmanager
 
 logger = logging.getLogger(__name__)
 
+# Connection bound by DatabaseManager.bound_transaction() for the current task
+_bound_connection: ContextVar[Optional[asyncpg.Connection]] = ContextVar('bound_connection', default=None)
+
+@dataclass(frozen=True, slots=True)
 class DatabaseConfig:
     """Database configuration class"""
     
-    def __init__(self):
-        # Database connection parameters
-        self.host = os.getenv('DB_HOST', 'localhost')
-        self.port = int(os.getenv('DB_PORT', '5432'))
-        self.database = os.getenv('DB_NAME', 'chatterfix_cmms')
-        self.username = os.getenv('DB_USER', 'chatterfix_app')
-        self.password = os.getenv('DB_PASSWORD', 'your_secure_password')
-        
-        # Connection pool settings
-        self.min_pool_size = int(os.getenv('DB_MIN_POOL_SIZE', '5'))
-        self.max_pool_size = int(os.getenv('DB_MAX_POOL_SIZE', '20'))
-        self.max_queries = int(os.getenv('DB_MAX_QUERIES', '50000'))
-        self.max_inactive_time = int(os.getenv('DB_MAX_INACTIVE_TIME', '300'))
-        
-        # SSL settings
-        self.ssl_mode = os.getenv('DB_SSL_MODE', 'prefer')  # 'require' for production
-        
-        # Connection URL
-        self.database_url = self._build_database_url()
+    # Database connection parameters
+    host: str = 'localhost'
+    port: int = 5432
+    database: str = 'chatterfix_cmms'
+    username: str = 'chatterfix_app'
+    password: str = field(default='your_secure_password', repr=False)
+    
+    # Connection pool settings
+    min_pool_size: int = 5
+    max_pool_size: int = 20
+    max_queries: int = 50000
+    max_inactive_time: int = 300
+    
+    # SSL settings
+    ssl_mode: str = 'prefer'  # 'require' for production
+    
+    # Connection URL
+    database_url: str = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, 'database_url', self._build_database_url())
+    
+    @classmethod
+    @functools.lru_cache(maxsize=1)
+    def from_env(cls) -> 'DatabaseConfig':
+        """Configuration from the environment, read once per process"""
+        return cls.read_env()
+    
+    @classmethod
+    def read_env(cls) -> 'DatabaseConfig':
+        """Read configuration from the current environment (uncached)"""
+        return cls(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=int(os.getenv('DB_PORT', '5432')),
+            database=os.getenv('DB_NAME', 'chatterfix_cmms'),
+            username=os.getenv('DB_USER', 'chatterfix_app'),
+            password=os.getenv('DB_PASSWORD', 'your_secure_password'),
+            min_pool_size=int(os.getenv('DB_MIN_POOL_SIZE', '5')),
+            max_pool_size=int(os.getenv('DB_MAX_POOL_SIZE', '20')),
+            max_queries=int(os.getenv('DB_MAX_QUERIES', '50000')),
+            max_inactive_time=int(os.getenv('DB_MAX_INACTIVE_TIME', '300')),
+            ssl_mode=os.getenv('DB_SSL_MODE', 'prefer')
+        )
     
     def _build_database_url(self) -> str:
         """Build database URL from components"""
@@ -75,9 +106,15 @@ class DatabaseManager:
                     max_queries=self.config.max_queries,
                     max_inactive_connection_lifetime=self.config.max_inactive_time,
                     command_timeout=60,
+                    # Keep prepared statements for the app's whole query set on each connection
+                    statement_cache_size=1024,
+                    max_cached_statement_lifetime=0,
+                    max_cacheable_statement_size=15 * 1024,
                     server_settings={
                         'application_name': 'chatterfix_cmms',
-                        'timezone': 'UTC'
+                        'timezone': 'UTC',
+                        # OLTP queries are short; JIT compilation costs more than it saves
+                        'jit': 'off'
                     }
                 )
                 
@@ -103,7 +140,12 @@ class DatabaseManager:
     
     @asynccontextmanager
     async def get_connection(self) -> AsyncGenerator[asyncpg.Connection, None]:
-        """Get a database connection from the pool"""
+        """Get a database connection from the pool (or the bound transaction connection)"""
+        bound = _bound_connection.get()
+        if bound is not None:
+            yield bound
+            return
+        
         if not self.pool:
             await self.initialize()
             
@@ -117,11 +159,44 @@ class DatabaseManager:
             async with conn.transaction():
                 yield conn
     
+    @asynccontextmanager
+    async def bound_transaction(self) -> AsyncGenerator[asyncpg.Connection, None]:
+        """Run every query issued in this context on one connection inside one transaction.
+        
+        The connection must not be used concurrently; nested get_transaction() calls
+        become savepoints.
+        """
+        async with self.get_transaction() as conn:
+            token = _bound_connection.set(conn)
+            try:
+                yield conn
+            finally:
+                _bound_connection.reset(token)
+    
+    def has_bound_connection(self) -> bool:
+        """Check whether queries in the current context run in a bound transaction"""
+        return _bound_connection.get() is not None
+    
     async def execute(self, query: str, *args) -> str:
         """Execute a query without returning results"""
         async with self.get_connection() as conn:
             return await conn.execute(query, *args)
     
+    async def executemany(self, query: str, args) -> None:
+        """Execute a query for each sequence of arguments in a single batch.
+        
+        asyncpg pipelines executemany: the statement is prepared once, every
+        Bind/Execute is sent back-to-back and a single Sync ends the batch.
+        """
+        async with self.get_connection() as conn:
+            await conn.executemany(query, args)
+    
+    async def fetch_many(self, query: str, args) -> list:
+        """Run a query for each sequence of arguments in one pipelined batch and
+        return the rows of all executions"""
+        async with self.get_connection() as conn:
+            return await conn.fetchmany(query, args)
+    
     async def fetch(self, query: str, *args) -> list:
         """Fetch multiple rows"""
         async with self.get_connection() as conn:
@@ -148,7 +223,7 @@ class DatabaseManager:
             return False
 
 # Global database manager instance
-db_config = DatabaseConfig()
+db_config = DatabaseConfig.from_env()
 db_manager = DatabaseManager(db_config)
 
 # Convenience functions for FastAPI dependency injection
@@ -5,11 +5,15 @@ Tests database migration, sync, performance, and backup systems
 
 import asyncio
 import asyncpg
+import functools
 import json
 import os
 import sys
+import uuid
+from collections import Counter
 from datetime import datetime, timedelta
 from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
 import logging
 from typing import Dict, Any, List
 
@@ -28,6 +32,46 @@ from database.repositories import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Demo company records seeded by DataMigrator
+DEMO_USER_ID = uuid.UUID('00000000-0000-0000-0000-000000000001')
+DEMO_ASSET_ID = uuid.UUID('00000000-0000-0000-0000-000000000001')
+
+# Read-only bases for test records; each test copies and overrides them
+WORK_ORDER_TEMPLATE = MappingProxyType({
+    'priority': 'MEDIUM',
+    'status': 'OPEN',
+    'created_by': DEMO_USER_ID
+})
+PM_TASK_TEMPLATE = MappingProxyType({
+    'asset_id': DEMO_ASSET_ID,
+    'trigger_type': 'TIME_BASED',
+    'frequency': 'MONTHLY',
+    'estimated_duration': 60,
+    'priority': 'MEDIUM',
+    'created_by': DEMO_USER_ID
+})
+
+STATUS_ICONS = {'PASSED': '✅', 'FAILED': '❌'}
+
+# Fixed query text per view so each one hits the connection's statement cache.
+# Only accessibility is checked, so stop at the first row instead of counting.
+VIEW_PROBE_QUERIES = {
+    'work_order_summary': "SELECT 1 FROM work_order_summary LIMIT 1",
+    'pm_compliance': "SELECT 1 FROM pm_compliance LIMIT 1",
+    'asset_utilization': "SELECT 1 FROM asset_utilization LIMIT 1",
+}
+
+@functools.lru_cache(maxsize=None)
+def get_repos(dbm) -> SimpleNamespace:
+    """Repositories bound to a database manager, shared across tester instances"""
+    return SimpleNamespace(
+        work_order=WorkOrderRepository(dbm),
+        pm_task=PMTaskRepository(dbm),
+        pm_schedule=PMScheduleRepository(dbm),
+        cost_entry=CostEntryRepository(dbm),
+        analytics=AnalyticsRepository(dbm)
+    )
+
 class DeploymentTester:
     """Comprehensive deployment testing suite"""
     
@@ -38,11 +82,7 @@ class DeploymentTester:
         }
         
         # Initialize repositories
-        self.work_order_repo = WorkOrderRepository(db_manager)
-        self.pm_task_repo = PMTaskRepository(db_manager)
-        self.pm_schedule_repo = PMScheduleRepository(db_manager)
-        self.cost_entry_repo = CostEntryRepository(db_manager)
-        self.analytics_repo = AnalyticsRepository(db_manager)
+        self.repos = get_repos(db_manager)
     
     async def run_all_tests(self) -> Dict[str, Any]:
         """Run complete deployment test suite"""
@@ -55,24 +95,25 @@ class DeploymentTester:
             # Test 2: Migration system
             await self.test_migrations()
             
-            # Test 3: Data operations (CRUD)
-            await self.test_data_operations()
-            
-            # Test 4: Sync system simulation
-            await self.test_sync_system()
-            
-            # Test 5: Performance monitoring
-            await self.test_performance_monitoring()
+            # Tests 3-6 touch disjoint data, so run them concurrently. Each
+            # test records its own result before re-raising.
+            results = await asyncio.gather(
+                self.test_data_operations(),
+                self.test_sync_system(),
+                self.test_performance_monitoring(),
+                self.test_analytics(),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
             
-            # Test 6: Backup and recovery
+            # Test 7: Backup and recovery
             await self.test_backup_recovery()
             
-            # Test 7: Conflict resolution
+            # Test 8: Conflict resolution
             await self.test_conflict_resolution()
             
-            # Test 8: Analytics and reporting
-            await self.test_analytics()
-            
             self.test_results['overall_status'] = 'PASSED'
             self.test_results['end_time'] = datetime.now().isoformat()
             
@@ -94,25 +135,29 @@ class DeploymentTester:
         
         test_name = "database_connection"
         try:
-            # Initialize database
+            # Initialize database (pool creation already runs SELECT version())
             await startup_database()
             
-            # Test health check
-            health = await db_manager.health_check()
-            assert health, "Database health check failed"
-            
-            # Test basic query
-            result = await db_manager.fetchval("SELECT 1")
-            assert result == 1, "Basic query failed"
-            
-            # Test transaction
+            # Test a query inside a transaction in one round-trip
             async with db_manager.get_transaction() as conn:
-                test_result = await conn.fetchval("SELECT 2")
-                assert test_result == 2, "Transaction test failed"
+                row = await conn.fetchrow("SELECT 1 AS basic, 2 AS in_transaction")
+                assert row['basic'] == 1, "Basic query failed"
+                assert row['in_transaction'] == 2, "Transaction test failed"
+            
+            # Pool sizing (DB_MIN_POOL_SIZE / DB_MAX_POOL_SIZE) bounds the concurrent tests
+            pool = db_manager.pool
+            pool_stats = {
+                'size': pool.get_size(),
+                'idle': pool.get_idle_size(),
+                'min_size': pool.get_min_size(),
+                'max_size': pool.get_max_size()
+            }
+            logger.info(f"Connection pool: {pool_stats}")
             
             self.test_results['tests'][test_name] = {
                 'status': 'PASSED',
-                'message': 'Database connection successful'
+                'message': 'Database connection successful',
+                'pool': pool_stats
             }
             
             logger.info("✅ Database connection test passed")
@@ -133,12 +178,8 @@ class DeploymentTester:
         try:
             migration_manager = MigrationManager(db_manager)
             
-            # Get migration status
-            status = await migration_manager.migration_status()
-            
             # Ensure all migrations are applied
-            applied_count = sum(1 for m in status if m['applied'])
-            total_count = len(status)
+            applied_count, total_count = await migration_manager.migration_status_counts()
             
             assert applied_count == total_count, f"Only {applied_count}/{total_count} migrations applied"
             
@@ -170,65 +211,60 @@ class DeploymentTester:
         operations_tested = []
         
         try:
-            # Test Work Order operations
-            wo_data = {
-                'title': 'Test Work Order',
-                'description': 'Test work order for deployment testing',
-                'priority': 'MEDIUM',
-                'status': 'OPEN',
-                'created_by': '00000000-0000-0000-0000-000000000001'
-            }
-            
-            # Create work order
-            created_wo = await self.work_order_repo.create(wo_data)
-            assert created_wo, "Work order creation failed"
-            operations_tested.append("work_order_create")
-            
-            # Read work order
-            read_wo = await self.work_order_repo.get_by_id(created_wo['id'])
-            assert read_wo, "Work order read failed"
-            assert read_wo['title'] == wo_data['title'], "Work order data mismatch"
-            operations_tested.append("work_order_read")
-            
-            # Update work order
-            updated_wo = await self.work_order_repo.update(created_wo['id'], {'status': 'IN_PROGRESS'})
-            assert updated_wo, "Work order update failed"
-            assert updated_wo['status'] == 'IN_PROGRESS', "Work order update data mismatch"
-            operations_tested.append("work_order_update")
-            
-            # Test PM Task operations
-            pm_data = {
-                'name': 'Test PM Task',
-                'description': 'Test PM task for deployment testing',
-                'asset_id': '00000000-0000-0000-0000-000000000001',
-                'trigger_type': 'TIME_BASED',
-                'frequency': 'MONTHLY',
-                'estimated_duration': 60,
-                'priority': 'MEDIUM',
-                'created_by': '00000000-0000-0000-0000-000000000001'
-            }
-            
-            created_pm = await self.pm_task_repo.create(pm_data)
-            assert created_pm, "PM task creation failed"
-            operations_tested.append("pm_task_create")
-            
-            # Test Cost Entry operations
-            cost_data = {
-                'work_order_id': created_wo['id'],
-                'type': 'LABOR',
-                'amount': 150.00,
-                'description': 'Test labor cost',
-                'created_by': '00000000-0000-0000-0000-000000000001'
-            }
-            
-            created_cost = await self.cost_entry_repo.create(cost_data)
-            assert created_cost, "Cost entry creation failed"
-            operations_tested.append("cost_entry_create")
-            
-            # Test financial summary
-            financials = await self.cost_entry_repo.get_financials_summary(created_wo['id'])
-            assert financials['total'] == 150.00, "Financial summary calculation failed"
-            operations_tested.append("financial_summary")
+            # Run every query of this test on one pooled connection
+            async with db_manager.bound_transaction():
+                # Test Work Order operations
+                wo_data = {
+                    **WORK_ORDER_TEMPLATE,
+                    'title': 'Test Work Order',
+                    'description': 'Test work order for deployment testing'
+                }
+                
+                # Create work order
+                created_wo = await self.repos.work_order.create(wo_data)
+                assert created_wo, "Work order creation failed"
+                operations_tested.append("work_order_create")
+                
+                # Read work order
+                read_wo = await self.repos.work_order.get_by_id(created_wo['id'])
+                assert read_wo, "Work order read failed"
+                assert read_wo['title'] == wo_data['title'], "Work order data mismatch"
+                operations_tested.append("work_order_read")
+                
+                # Update work order
+                updated_wo = await self.repos.work_order.update(created_wo['id'], {'status': 'IN_PROGRESS'})
+                assert updated_wo, "Work order update failed"
+                assert updated_wo['status'] == 'IN_PROGRESS', "Work order update data mismatch"
+                operations_tested.append("work_order_update")
+                
+                # Test PM Task operations
+                pm_data = {
+                    **PM_TASK_TEMPLATE,
+                    'name': 'Test PM Task',
+                    'description': 'Test PM task for deployment testing'
+                }
+                
+                created_pm = await self.repos.pm_task.create(pm_data)
+                assert created_pm, "PM task creation failed"
+                operations_tested.append("pm_task_create")
+                
+                # Test Cost Entry operations
+                cost_data = {
+                    'work_order_id': created_wo['id'],
+                    'type': 'LABOR',
+                    'amount': 150.00,
+                    'description': 'Test labor cost',
+                    'created_by': DEMO_USER_ID
+                }
+                
+                created_cost = await self.repos.cost_entry.create(cost_data)
+                assert created_cost, "Cost entry creation failed"
+                operations_tested.append("cost_entry_create")
+                
+                # Test financial summary
+                financials = await self.repos.cost_entry.get_financials_summary(created_wo['id'])
+                assert financials['total'] == 150.00, "Financial summary calculation failed"
+                operations_tested.append("financial_summary")
             
             self.test_results['tests'][test_name] = {
                 'status': 'PASSED',
@@ -253,42 +289,47 @@ class DeploymentTester:
         
         test_name = "sync_system"
         try:
-            # Simulate creating sync operations
-            sync_operations = []
-            
-            # Create test sync status entries
-            for i in range(3):
-                sync_id = f"test_sync_{i}_{int(datetime.now().timestamp())}"
-                await db_manager.execute(
+            # Run every query of this test on one pooled connection
+            client_id = 'test_client'
+            async with db_manager.bound_transaction() as conn:
+                # Create test sync status entries in one round-trip
+                rows = [
+                    (uuid.uuid4(), 'test_table', uuid.uuid4(), 'CREATE', client_id, False)
+                    for _ in range(3)
+                ]
+                await db_manager.executemany(
                     """
                     INSERT INTO sync_status (id, table_name, record_id, operation, client_id, synced)
                     VALUES ($1, $2, $3, $4, $5, $6)
                     """,
-                    sync_id, 'test_table', f'test_record_{i}', 'CREATE', 'test_client', False
+                    rows
                 )
-                sync_operations.append(sync_id)
-            
-            # Test pending sync count
-            pending_count = await db_manager.fetchval(
-                "SELECT COUNT(*) FROM sync_status WHERE client_id = 'test_client' AND synced = false"
-            )
-            assert pending_count == 3, f"Expected 3 pending sync operations, got {pending_count}"
-            
-            # Test marking operations as synced
-            for sync_id in sync_operations:
+                sync_operations = [row[0] for row in rows]
+                
+                # Test pending sync count
+                pending_count = await conn.fetchval(
+                    "SELECT COUNT(*) FROM sync_status WHERE client_id = $1 AND synced = false",
+                    client_id
+                )
+                assert pending_count == 3, f"Expected 3 pending sync operations, got {pending_count}"
+                
+                # Test marking operations as synced
                 await db_manager.execute(
-                    "UPDATE sync_status SET synced = true, synced_at = CURRENT_TIMESTAMP WHERE id = $1",
-                    sync_id
+                    "UPDATE sync_status SET synced = true, synced_at = CURRENT_TIMESTAMP WHERE id = ANY($1::uuid[])",
+                    sync_operations
                 )
-            
-            # Verify sync completion
-            remaining_count = await db_manager.fetchval(
-                "SELECT COUNT(*) FROM sync_status WHERE client_id = 'test_client' AND synced = false"
-            )
-            assert remaining_count == 0, f"Expected 0 pending operations after sync, got {remaining_count}"
-            
-            # Clean up test data
-            await db_manager.execute("DELETE FROM sync_status WHERE client_id = 'test_client'")
+                
+                # Clean up test data and verify sync completion from the deleted rows
+                remaining_count = await conn.fetchval(
+                    """
+                    WITH deleted AS (
+                        DELETE FROM sync_status WHERE client_id = $1 RETURNING synced
+                    )
+                    SELECT COUNT(*) FILTER (WHERE NOT synced) FROM deleted
+                    """,
+                    client_id
+                )
+                assert remaining_count == 0, f"Expected 0 pending operations after sync, got {remaining_count}"
             
             self.test_results['tests'][test_name] = {
                 'status': 'PASSED',
@@ -364,12 +405,12 @@ class DeploymentTester:
             
             # Clean up test backup
             backup_file = Path(backup_result['backup_file'])
-            metadata_file = backup_file.parent / f"{backup_name}.metadata.json"
+            metadata_file = backup_file.with_name(f"{backup_name}.metadata.json")
             
-            if backup_file.exists():
-                backup_file.unlink()
-            if metadata_file.exists():
-                metadata_file.unlink()
+            await asyncio.gather(
+                asyncio.to_thread(backup_file.unlink, missing_ok=True),
+                asyncio.to_thread(metadata_file.unlink, missing_ok=True)
+            )
             
             self.test_results['tests'][test_name] = {
                 'status': 'PASSED',
@@ -394,48 +435,50 @@ class DeploymentTester:
         
         test_name = "conflict_resolution"
         try:
-            # Create a work order for conflict testing
-            wo_data = {
-                'title': 'Conflict Test Work Order',
-                'description': 'Testing conflict resolution',
-                'priority': 'LOW',
-                'status': 'OPEN',
-                'created_by': '00000000-0000-0000-0000-000000000001'
-            }
-            
-            created_wo = await self.work_order_repo.create(wo_data)
-            work_order_id = created_wo['id']
-            
-            # Simulate conflict: Update from server
-            server_update = await self.work_order_repo.update(work_order_id, {
-                'status': 'IN_PROGRESS',
-                'priority': 'HIGH'
-            })
-            
-            # Simulate client attempting conflicting update
-            # In a real scenario, this would be detected by comparing timestamps
-            client_timestamp = datetime.now() - timedelta(minutes=5)  # Older timestamp
-            server_timestamp = server_update['updated_at']
-            
-            # Conflict detection logic
-            conflict_detected = server_timestamp > client_timestamp
-            assert conflict_detected, "Conflict detection failed"
-            
-            # Test conflict resolution (server wins)
-            current_wo = await self.work_order_repo.get_by_id(work_order_id)
-            assert current_wo['status'] == 'IN_PROGRESS', "Server wins resolution failed"
-            assert current_wo['priority'] == 'HIGH', "Server wins resolution failed"
-            
-            # Create audit log entry for conflict resolution
-            await db_manager.execute(
-                """
-                INSERT INTO audit_log (table_name, record_id, operation, new_values, changed_at)
-                VALUES ($1, $2, $3, $4, $5)
-                """,
-                'work_orders', work_order_id, 'CONFLICT_RESOLVED',
-                json.dumps({'resolution': 'server_wins', 'conflict_detected_at': datetime.now().isoformat()}),
-                datetime.now()
-            )
+            # Run every query of this test on one pooled connection
+            async with db_manager.bound_transaction():
+                # Create a work order for conflict testing
+                wo_data = {
+                    **WORK_ORDER_TEMPLATE,
+                    'title': 'Conflict Test Work Order',
+                    'description': 'Testing conflict resolution',
+                    'priority': 'LOW'
+                }
+                
+                created_wo = await self.repos.work_order.create(wo_data)
+                work_order_id = created_wo['id']
+                
+                # Simulate conflict: Update from server
+                server_update = await self.repos.work_order.update(work_order_id, {
+                    'status': 'IN_PROGRESS',
+                    'priority': 'HIGH'
+                })
+                
+                # Simulate client attempting conflicting update
+                # In a real scenario, this would be detected by comparing timestamps
+                now = datetime.now()
+                client_timestamp = now - timedelta(minutes=5)  # Older timestamp
+                server_timestamp = server_update['updated_at']
+                
+                # Conflict detection logic
+                conflict_detected = server_timestamp > client_timestamp
+                assert conflict_detected, "Conflict detection failed"
+                
+                # Test conflict resolution (server wins) and log it in one round-trip
+                current_wo = await db_manager.fetchrow(
+                    """
+                    WITH audit AS (
+                        INSERT INTO audit_log (table_name, record_id, operation, new_values, changed_at)
+                        VALUES ('work_orders', $1, 'CONFLICT_RESOLVED', $2::jsonb, $3)
+                    )
+                    SELECT status, priority FROM work_orders WHERE id = $1
+                    """,
+                    work_order_id,
+                    json.dumps({'resolution': 'server_wins', 'conflict_detected_at': now.isoformat()}),
+                    now
+                )
+                assert current_wo['status'] == 'IN_PROGRESS', "Server wins resolution failed"
+                assert current_wo['priority'] == 'HIGH', "Server wins resolution failed"
             
             self.test_results['tests'][test_name] = {
                 'status': 'PASSED',
@@ -461,26 +504,23 @@ class DeploymentTester:
         test_name = "analytics"
         try:
             # Test PM analytics
-            pm_analytics = await self.analytics_repo.get_pm_analytics()
+            pm_analytics = await self.repos.analytics.get_pm_analytics()
             
             required_fields = ['total_tasks', 'active_tasks', 'completion_rate', 'timestamp']
             for field in required_fields:
                 assert field in pm_analytics, f"PM analytics missing {field}"
             
-            # Test data views
-            views_to_test = [
-                'work_order_summary',
-                'pm_compliance',
-                'asset_utilization'
-            ]
-            
-            view_results = {}
-            for view in views_to_test:
+            # Test data views concurrently
+            async def check_view(view: str, query: str):
                 try:
-                    result = await db_manager.fetch(f"SELECT COUNT(*) as count FROM {view} LIMIT 1")
-                    view_results[view] = 'accessible'
+                    await db_manager.fetchval(query)
+                    return view, 'accessible'
                 except Exception as e:
-                    view_results[view] = f'error: {str(e)}'
+                    return view, f'error: {str(e)}'
+            
+            view_results = dict(await asyncio.gather(
+                *(check_view(view, query) for view, query in VIEW_PROBE_QUERIES.items())
+            ))
             
             # Verify at least basic views are accessible
             accessible_views = sum(1 for status in view_results.values() if status == 'accessible')
@@ -505,49 +545,51 @@ class DeploymentTester:
     
     def generate_report(self) -> str:
         """Generate a comprehensive test report"""
-        report = []
-        report.append("=" * 60)
-        report.append("ChatterFix CMMS Deployment Test Report")
-        report.append("=" * 60)
-        report.append(f"Started: {self.test_results['start_time']}")
-        report.append(f"Completed: {self.test_results.get('end_time', 'In Progress')}")
-        report.append(f"Overall Status: {self.test_results.get('overall_status', 'Unknown')}")
-        report.append("")
+        return "\n".join(self._report_lines())
+    
+    def _report_lines(self):
+        """Yield the lines of the test report"""
+        results = self.test_results
+        tests = results['tests']
+        
+        yield "=" * 60
+        yield "ChatterFix CMMS Deployment Test Report"
+        yield "=" * 60
+        yield f"Started: {results['start_time']}"
+        yield f"Completed: {results.get('end_time', 'In Progress')}"
+        yield f"Overall Status: {results.get('overall_status', 'Unknown')}"
+        yield ""
         
         # Test results summary
-        total_tests = len(self.test_results['tests'])
-        passed_tests = sum(1 for test in self.test_results['tests'].values() if test.get('status') == 'PASSED')
+        status_counts = Counter(test.get('status') for test in tests.values())
         
-        report.append(f"Test Summary: {passed_tests}/{total_tests} tests passed")
-        report.append("")
+        yield f"Test Summary: {status_counts['PASSED']}/{len(tests)} tests passed"
+        yield ""
         
         # Individual test results
-        for test_name, test_result in self.test_results['tests'].items():
+        for test_name, test_result in tests.items():
             status = test_result.get('status', 'Unknown')
-            status_icon = "✅" if status == 'PASSED' else "❌"
             
-            report.append(f"{status_icon} {test_name.replace('_', ' ').title()}: {status}")
+            yield f"{STATUS_ICONS.get(status, '❌')} {test_name.replace('_', ' ').title()}: {status}"
             
             if status == 'FAILED' and 'error' in test_result:
-                report.append(f"   Error: {test_result['error']}")
+                yield f"   Error: {test_result['error']}"
             
             # Add relevant metrics
             for key, value in test_result.items():
-                if key not in ['status', 'error'] and not key.startswith('_'):
-                    report.append(f"   {key}: {value}")
+                if key not in ('status', 'error') and not key.startswith('_'):
+                    yield f"   {key}: {value}"
             
-            report.append("")
+            yield ""
         
         # Recommendations
-        if self.test_results.get('overall_status') == 'PASSED':
-            report.append("🎉 All tests passed! Your ChatterFix CMMS deployment is ready for production.")
+        if results.get('overall_status') == 'PASSED':
+            yield "🎉 All tests passed! Your ChatterFix CMMS deployment is ready for production."
         else:
-            report.append("⚠️  Some tests failed. Please review the errors above before deploying.")
+            yield "⚠️  Some tests failed. Please review the errors above before deploying."
         
-        report.append("")
-        report.append("=" * 60)
-        
-        return "\n".join(report)
+        yield ""
+        yield "=" * 60
 
 async def main():
     """Main deployment testing function"""
@@ -562,8 +604,7 @@ async def main():
         
         # Save report to file
         report_file = Path(__file__).parent / f"deployment_test_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        with open(report_file, 'w') as f:
-            f.write(report)
+        await asyncio.to_thread(report_file.write_text, report)
         
         print(f"\nDetailed report saved to: {report_file}")
         
@@ -579,4 +620,10 @@ async def main():
         await shutdown_database()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop is unavailable on Windows; fall back to the default loop
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
\ No newline at end of file
@@ -4,9 +4,12 @@ Handles schema migrations and data migrations
 """
 
 import os
+import re
 import asyncio
+import hashlib
+from functools import cached_property
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
 import asyncpg
 from datetime import datetime
 import logging
@@ -14,6 +17,88 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Header comment marking a migration as safe to apply alongside its
+# parallel-safe neighbours (no dependencies between them)
+PARALLEL_MARKER = "-- @parallel"
+
+# Header comment for migrations that must run outside a transaction, e.g.
+# CREATE INDEX CONCURRENTLY; each statement is executed (and commits) on its own
+CONCURRENT_MARKER = "-- @concurrent"
+
+# Upper bound on migrations applied at once from a parallel-safe batch
+MAX_PARALLEL_MIGRATIONS = 8
+
+_DOLLAR_QUOTE = re.compile(r"\$[A-Za-z_][A-Za-z_0-9]*\$|\$\$")
+
+# Transaction-local settings for faster DDL and index builds during migrations.
+# Durability is relaxed only until each migration's own COMMIT.
+BULK_MIGRATION_SETTINGS = (
+    "SET LOCAL synchronous_commit = off;\n"
+    "SET LOCAL maintenance_work_mem = '1GB';\n"
+    "SET LOCAL max_parallel_maintenance_workers = 4;\n"
+)
+
+# Seeds larger than this are loaded with COPY through a staging table
+BULK_SEED_THRESHOLD = 100
+
+def _quote_literal(value: str) -> str:
+    """Quote a string as a SQL literal (standard_conforming_strings is on by default)"""
+    return "'" + value.replace("'", "''") + "'"
+
+def _split_sql_statements(sql: str) -> List[str]:
+    """Split a SQL script on top-level semicolons.
+    
+    Semicolons inside quotes, dollar-quoted bodies and comments are ignored;
+    comment-only fragments are dropped.
+    """
+    statements = []
+    start = 0
+    has_code = False
+    i = 0
+    n = len(sql)
+    
+    while i < n:
+        char = sql[i]
+        
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        
+        if char in ("'", '"'):
+            # Doubled quotes are escapes, so scanning to each next quote works
+            end = sql.find(char, i + 1)
+            while end != -1 and sql.startswith(char * 2, end):
+                end = sql.find(char, end + 2)
+            i = n if end == -1 else end + 1
+            has_code = True
+            continue
+        
+        if char == '$':
+            match = _DOLLAR_QUOTE.match(sql, i)
+            if match:
+                end = sql.find(match.group(), match.end())
+                i = n if end == -1 else end + len(match.group())
+                has_code = True
+                continue
+        
+        if char == ';':
+            if has_code:
+                statements.append(sql[start:i].strip())
+            start = i + 1
+            has_code = False
+        elif not char.isspace():
+            has_code = True
+        i += 1
+    
+    if has_code:
+        statements.append(sql[start:].strip())
+    return statements
+
 class Migration:
     """Represents a single database migration"""
     
@@ -24,6 +109,39 @@ class Migration:
         self.rollback_path = rollback_path
         self.applied_at: Optional[datetime] = None
     
+    @cached_property
+    def sql(self) -> str:
+        """Migration SQL, read from disk once"""
+        return Path(self.sql_path).read_text()
+    
+    @cached_property
+    def checksum(self) -> bytes:
+        """Raw SHA-256 digest of the migration SQL"""
+        return hashlib.sha256(self.sql.encode()).digest()
+    
+    @cached_property
+    def header_lines(self) -> List[str]:
+        """Comment lines of the leading comment block"""
+        header = []
+        for line in self.sql.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith('--'):
+                break
+            header.append(line)
+        return header
+    
+    @property
+    def parallel(self) -> bool:
+        """Whether the migration is marked parallel-safe"""
+        return PARALLEL_MARKER in self.header_lines
+    
+    @property
+    def concurrent(self) -> bool:
+        """Whether the migration must run statement by statement outside a transaction"""
+        return CONCURRENT_MARKER in self.header_lines
+    
     def __str__(self):
         return f"Migration {self.version}: {self.name}"
     
@@ -37,6 +155,11 @@ class MigrationManager:
         self.db_manager = db_manager
         self.migrations_dir = Path(__file__).parent / "migrations"
         self.migrations: List[Migration] = []
+        self._by_version: Dict[str, Migration] = {}
+        # Applied versions as last read from schema_migrations; reset whenever
+        # this manager applies or rolls back a migration
+        self._applied_cache: Optional[Dict[str, datetime]] = None
+        self.bulk_mode = os.getenv('MIGRATION_BULK_MODE', 'false').lower() == 'true'
         self._load_migrations()
     
     def _load_migrations(self):
@@ -46,11 +169,20 @@ class MigrationManager:
             logger.warning(f"Created migrations directory: {self.migrations_dir}")
             return
         
-        migration_files = sorted(self.migrations_dir.glob("*.sql"))
+        # One directory listing serves both the migrations and their rollback
+        # scripts, instead of a stat per file
+        with os.scandir(self.migrations_dir) as entries:
+            sql_files = {
+                entry.name[:-len('.sql')]: entry.path
+                for entry in entries
+                if entry.name.endswith('.sql') and entry.is_file()
+            }
         
-        for file_path in migration_files:
+        for filename in sorted(sql_files):
+            if filename.endswith('_rollback'):
+                continue
+            
             # Parse migration filename: 001_initial_schema.sql
-            filename = file_path.stem
             parts = filename.split('_', 1)
             
             if len(parts) != 2:
@@ -58,19 +190,30 @@ class MigrationManager:
                 continue
             
             version, name = parts
-            rollback_path = self.migrations_dir / f"{filename}_rollback.sql"
             
             migration = Migration(
                 version=version,
                 name=name.replace('_', ' ').title(),
-                sql_path=str(file_path),
-                rollback_path=str(rollback_path) if rollback_path.exists() else None
+                sql_path=sql_files[filename],
+                rollback_path=sql_files.get(f"{filename}_rollback")
             )
             
             self.migrations.append(migration)
+            self._by_version[version] = migration
         
         logger.info(f"Loaded {len(self.migrations)} migration files")
     
+    @staticmethod
+    def _batch_migrations(migrations: List[Migration]) -> List[List[Migration]]:
+        """Group consecutive parallel-safe migrations; every other migration is its own batch"""
+        batches: List[List[Migration]] = []
+        for migration in migrations:
+            if migration.parallel and batches and batches[-1][0].parallel:
+                batches[-1].append(migration)
+            else:
+                batches.append([migration])
+        return batches
+    
     async def ensure_migration_table(self):
         """Create the migration tracking table if it doesn't exist"""
         query = """
@@ -78,8 +221,23 @@ class MigrationManager:
             version VARCHAR(50) PRIMARY KEY,
             name VARCHAR(255) NOT NULL,
             applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-            checksum VARCHAR(64)
+            checksum BYTEA
         );
+        
+        -- Tables created before checksums were stored as raw digests hold hex text
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND table_name = 'schema_migrations'
+                  AND column_name = 'checksum'
+                  AND data_type <> 'bytea'
+            ) THEN
+                ALTER TABLE schema_migrations
+                    ALTER COLUMN checksum TYPE BYTEA USING decode(checksum, 'hex');
+            END IF;
+        END $$;
         """
         
         async with self.db_manager.get_connection() as conn:
@@ -88,15 +246,31 @@ class MigrationManager:
     
     async def get_applied_migrations(self) -> Dict[str, datetime]:
         """Get list of applied migrations from the database"""
-        query = "SELECT version, applied_at FROM schema_migrations ORDER BY version"
+        if self._applied_cache is not None:
+            return dict(self._applied_cache)
+        
+        query = "SELECT version, applied_at, checksum FROM schema_migrations ORDER BY version"
         
         try:
             async with self.db_manager.get_connection() as conn:
                 rows = await conn.fetch(query)
-                return {row['version']: row['applied_at'] for row in rows}
         except asyncpg.UndefinedTableError:
             # Migration table doesn't exist yet
             return {}
+        
+        self._check_drift({row['version']: row['checksum'] for row in rows})
+        self._applied_cache = {row['version']: row['applied_at'] for row in rows}
+        return dict(self._applied_cache)
+    
+    def _check_drift(self, applied_checksums: Dict[str, Any]):
+        """Warn about applied migrations whose file has changed since it was applied"""
+        for migration in self.migrations:
+            recorded = applied_checksums.get(migration.version)
+            # Hex text until ensure_migration_table has converted the column
+            if isinstance(recorded, str):
+                recorded = bytes.fromhex(recorded)
+            if recorded and recorded != migration.checksum:
+                logger.warning(f"{migration} has changed since it was applied (checksum mismatch)")
     
     async def run_migrations(self, target_version: Optional[str] = None):
         """Run all pending migrations up to target version"""
@@ -120,36 +294,59 @@ class MigrationManager:
         
         logger.info(f"Running {len(pending_migrations)} pending migrations...")
         
-        for migration in pending_migrations:
-            await self._apply_migration(migration)
+        for batch in self._batch_migrations(pending_migrations):
+            if len(batch) == 1:
+                await self._apply_migration(batch[0])
+                continue
+            
+            # Each migration takes its own pooled connection and transaction;
+            # leave part of the pool free for everything else using it
+            limit = min(len(batch), MAX_PARALLEL_MIGRATIONS, max(1, self._pool_max_size() // 2))
+            semaphore = asyncio.Semaphore(limit)
+            
+            async def apply_bounded(migration: Migration):
+                async with semaphore:
+                    await self._apply_migration(migration)
+            
+            logger.info(f"Applying {len(batch)} parallel-safe migrations, {limit} at a time")
+            async with asyncio.TaskGroup() as tg:
+                for migration in batch:
+                    tg.create_task(apply_bounded(migration))
         
         logger.info("All migrations completed successfully")
     
+    def _pool_max_size(self) -> int:
+        """Maximum size of the connection pool migrations draw from"""
+        pool = self.db_manager.pool
+        if pool is not None:
+            return pool.get_max_size()
+        return self.db_manager.config.max_pool_size
+    
     async def _apply_migration(self, migration: Migration):
         """Apply a single migration"""
         logger.info(f"Applying {migration}")
         
-        # Read migration SQL
-        with open(migration.sql_path, 'r') as f:
-            sql_content = f.read()
+        # Migration SQL and checksum are read and hashed once per process
+        sql_content, checksum = migration.sql, migration.checksum
         
-        # Calculate checksum
-        import hashlib
-        checksum = hashlib.sha256(sql_content.encode()).hexdigest()
+        # Record the migration as applied in the same simple-query batch as its
+        # SQL; multi-statement execute takes no parameters, so quote the
+        # (filename-derived) values as literals
+        record_sql = (
+            "INSERT INTO schema_migrations (version, name, checksum) VALUES "
+            f"({_quote_literal(migration.version)}, {_quote_literal(migration.name)}, "
+            f"decode({_quote_literal(checksum.hex())}, 'hex'));"
+        )
+        
+        if migration.concurrent:
+            await self._apply_concurrent_migration(migration, record_sql)
+            return
         
         async with self.db_manager.get_transaction() as conn:
             try:
-                # Execute migration SQL
-                await conn.execute(sql_content)
-                
-                # Record migration as applied
-                await conn.execute(
-                    """
-                    INSERT INTO schema_migrations (version, name, checksum)
-                    VALUES ($1, $2, $3)
-                    """,
-                    migration.version, migration.name, checksum
-                )
+                # Execute migration SQL and record it in one round-trip
+                await conn.execute(f"{self._bulk_session_setup()}{sql_content}\n;\n{record_sql}")
+                self._applied_cache = None
                 
                 logger.info(f"Successfully applied {migration}")
                 
@@ -157,9 +354,32 @@ class MigrationManager:
                 logger.error(f"Failed to apply {migration}: {e}")
                 raise
     
+    async def _apply_concurrent_migration(self, migration: Migration, record_sql: str):
+        """Apply a migration outside a transaction, one autocommitted statement at a time"""
+        async with self.db_manager.get_connection() as conn:
+            try:
+                for statement in _split_sql_statements(migration.sql):
+                    await conn.execute(statement)
+                
+                # Record only once every statement has gone through
+                await conn.execute(record_sql)
+                self._applied_cache = None
+                
+                logger.info(f"Successfully applied {migration} (outside a transaction)")
+                
+            except Exception as e:
+                # Earlier statements have committed; a failed CONCURRENTLY build
+                # leaves an INVALID index that must be dropped before retrying
+                logger.error(f"Failed to apply {migration}; earlier statements are not rolled back: {e}")
+                raise
+    
+    def _bulk_session_setup(self) -> str:
+        """SET LOCAL prefix for a migration batch when MIGRATION_BULK_MODE is enabled"""
+        return BULK_MIGRATION_SETTINGS if self.bulk_mode else ""
+    
     async def rollback_migration(self, version: str):
         """Rollback a specific migration"""
-        migration = next((m for m in self.migrations if m.version == version), None)
+        migration = self._by_version.get(version)
         
         if not migration:
             raise ValueError(f"Migration version {version} not found")
@@ -183,6 +403,7 @@ class MigrationManager:
                     "DELETE FROM schema_migrations WHERE version = $1",
                     version
                 )
+                self._applied_cache = None
                 
                 logger.info(f"Successfully rolled back {migration}")
                 
@@ -190,9 +411,34 @@ class MigrationManager:
                 logger.error(f"Failed to rollback {migration}: {e}")
                 raise
     
-    async def migration_status(self) -> List[Dict]:
-        """Get status of all migrations"""
-        applied_migrations = await self.get_applied_migrations()
+    async def migration_status_counts(self) -> Tuple[int, int]:
+        """Get (applied, total) counts for the loaded migrations in one query"""
+        versions = [m.version for m in self.migrations]
+        query = "SELECT COUNT(*) FROM schema_migrations WHERE version = ANY($1::text[])"
+        
+        try:
+            async with self.db_manager.get_connection() as conn:
+                applied = await conn.fetchval(query, versions)
+        except asyncpg.UndefinedTableError:
+            # Migration table doesn't exist yet
+            applied = 0
+        
+        return applied, len(versions)
+    
+    async def migration_status(self, *, force_refresh: bool = False) -> List[Dict]:
+        """Get status of all migrations.
+        
+        Served from the applied-migrations cache when it is populated, so
+        repeated calls (e.g. readiness probes) do not query the database;
+        force_refresh re-reads schema_migrations.
+        """
+        if force_refresh:
+            self._applied_cache = None
+        
+        if self._applied_cache is not None:
+            applied_migrations = self._applied_cache
+        else:
+            applied_migrations = await self.get_applied_migrations()
         
         status = []
         for migration in self.migrations:
@@ -216,20 +462,73 @@ class DataMigrator:
         """Migrate demo data from current system to PostgreSQL"""
         logger.info("Starting demo data migration...")
         
-        # Demo company
-        await self._migrate_company()
-        
-        # Demo users
-        await self._migrate_users()
-        
-        # Demo assets
-        await self._migrate_assets()
-        
-        # Demo work orders (if any exist in localStorage format)
-        await self._migrate_work_orders()
+        # Seed everything atomically on one connection; the helpers below
+        # pick up the bound transaction through get_connection()
+        async with self.db_manager.bound_transaction():
+            # Demo company
+            await self._migrate_company()
+            
+            # Demo users
+            await self._migrate_users()
+            
+            # Demo assets
+            await self._migrate_assets()
+            
+            # Demo work orders (if any exist in localStorage format)
+            await self._migrate_work_orders()
         
         logger.info("Demo data migration completed")
     
+    async def _seed_rows(
+        self,
+        conn: asyncpg.Connection,
+        query: str,
+        rows: List[tuple],
+        table: str,
+        columns: List[str],
+        conflict_column: str,
+        update_columns: List[str]
+    ):
+        """Upsert seed rows: a pipelined executemany for small seeds, COPY for large ones"""
+        if len(rows) > BULK_SEED_THRESHOLD:
+            await self._bulk_upsert(conn, table, columns, rows, conflict_column, update_columns)
+        else:
+            # Parse and plan once, then bind every row against the same statement
+            stmt = await conn.prepare(query)
+            await stmt.executemany(rows)
+    
+    async def _bulk_upsert(
+        self,
+        conn: asyncpg.Connection,
+        table: str,
+        columns: List[str],
+        rows: List[tuple],
+        conflict_column: str,
+        update_columns: List[str]
+    ):
+        """COPY rows into a temporary staging table, then upsert them in one statement"""
+        staging = f"tmp_{table}"
+        column_list = ", ".join(columns)
+        updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in update_columns)
+        
+        # ON COMMIT DROP needs a transaction; nested inside one this is a savepoint
+        async with conn.transaction():
+            await conn.execute(
+                f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+            await conn.copy_records_to_table(staging, records=rows, columns=columns)
+            await conn.execute(
+                f"""
+                INSERT INTO {table} ({column_list})
+                SELECT {column_list} FROM {staging}
+                ON CONFLICT ({conflict_column}) DO UPDATE SET
+                    {updates},
+                    updated_at = CURRENT_TIMESTAMP
+                """
+            )
+            # Drop now so a later upsert into the same table in this transaction can stage again
+            await conn.execute(f"DROP TABLE {staging}")
+    
     async def _migrate_company(self):
         """Migrate company data"""
         company_data = {
@@ -285,8 +584,12 @@ class DataMigrator:
         """
         
         async with self.db_manager.get_connection() as conn:
-            for user in users:
-                await conn.execute(query, user['id'], user['email'], user['name'], user['role'])
+            await self._seed_rows(
+                conn, query,
+                [(user['id'], user['email'], user['name'], user['role']) for user in users],
+                'users', ['id', 'email', 'name', 'role'],
+                'email', ['name', 'role']
+            )
         
         logger.info(f"Migrated {len(users)} users")
     
@@ -325,13 +628,19 @@ class DataMigrator:
         company_id = '00000000-0000-0000-0000-000000000001'
         
         async with self.db_manager.get_connection() as conn:
-            for asset in assets:
-                await conn.execute(
-                    query,
-                    asset['id'], asset['asset_code'], asset['name'],
-                    asset['location'], asset['status'], asset['category'],
-                    company_id
-                )
+            await self._seed_rows(
+                conn, query,
+                [
+                    (
+                        asset['id'], asset['asset_code'], asset['name'],
+                        asset['location'], asset['status'], asset['category'],
+                        company_id
+                    )
+                    for asset in assets
+                ],
+                'assets', ['id', 'asset_code', 'name', 'location', 'status', 'category', 'company_id'],
+                'asset_code', ['name', 'location', 'status', 'category']
+            )
         
         logger.info(f"Migrated {len(assets)} assets")
     
@@ -340,17 +649,19 @@ class DataMigrator:
         # This would read from localStorage/IndexedDB format if available
         # For now, just create a sample work order
         
-        work_order = {
-            'id': '00000000-0000-0000-0000-000000000001',
-            'wo_number': 'WO-2024-001',
-            'title': 'Maintenance on Conveyor Belt #3',
-            'description': 'Investigate loud noise from conveyor belt',
-            'priority': 'MEDIUM',
-            'status': 'OPEN',
-            'asset_id': '00000000-0000-0000-0000-000000000002',
-            'assigned_to': '00000000-0000-0000-0000-000000000002',
-            'created_by': '00000000-0000-0000-0000-000000000001'
-        }
+        work_orders = [
+            {
+                'id': '00000000-0000-0000-0000-000000000001',
+                'wo_number': 'WO-2024-001',
+                'title': 'Maintenance on Conveyor Belt #3',
+                'description': 'Investigate loud noise from conveyor belt',
+                'priority': 'MEDIUM',
+                'status': 'OPEN',
+                'asset_id': '00000000-0000-0000-0000-000000000002',
+                'assigned_to': '00000000-0000-0000-0000-000000000002',
+                'created_by': '00000000-0000-0000-0000-000000000001'
+            }
+        ]
         
         query = """
         INSERT INTO work_orders (id, wo_number, title, description, priority, status, asset_id, assigned_to, created_by)
@@ -363,14 +674,23 @@ class DataMigrator:
         """
         
         async with self.db_manager.get_connection() as conn:
-            await conn.execute(
-                query,
-                work_order['id'], work_order['wo_number'], work_order['title'],
-                work_order['description'], work_order['priority'], work_order['status'],
-                work_order['asset_id'], work_order['assigned_to'], work_order['created_by']
+            await self._seed_rows(
+                conn, query,
+                [
+                    (
+                        wo['id'], wo['wo_number'], wo['title'],
+                        wo['description'], wo['priority'], wo['status'],
+                        wo['asset_id'], wo['assigned_to'], wo['created_by']
+                    )
+                    for wo in work_orders
+                ],
+                'work_orders',
+                ['id', 'wo_number', 'title', 'description', 'priority', 'status',
+                 'asset_id', 'assigned_to', 'created_by'],
+                'wo_number', ['title', 'description', 'status']
             )
         
-        logger.info("Migrated sample work order")
+        logger.info(f"Migrated {len(work_orders)} work orders")
 
 # CLI interface for migrations
 async def run_migrations_cli():
@@ -391,4 +711,10 @@ async def run_migrations_cli():
         await db_manager.close()
 
 if __name__ == "__main__":
-    asyncio.run(run_migrations_cli())
\ No newline at end of file
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop is unavailable on Windows; fall back to the default loop
+        asyncio.run(run_migrations_cli())
+    else:
+        uvloop.run(run_migrations_cli())
\ No newline at end of file
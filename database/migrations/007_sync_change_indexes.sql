@@ -0,0 +1,10 @@
+-- Migration 007: Sync Change Indexes
+-- Support keyset pagination of server changes by (updated_at, id)
+
+-- =============================================================================
+-- SYNC CHANGE FEED INDEXES
+-- =============================================================================
+
+CREATE INDEX idx_work_orders_updated_at_id ON work_orders(updated_at, id);
+CREATE INDEX idx_pm_tasks_updated_at_id ON pm_tasks(updated_at, id);
+CREATE INDEX idx_pm_schedule_updated_at_id ON pm_schedule(updated_at, id);
@@ -0,0 +1,18 @@
+-- Migration 008: Hot Path Indexes
+-- Composite and partial indexes for open work order, PM due-list,
+-- per-company asset and per-work-order cost queries
+
+-- =============================================================================
+-- HOT PATH INDEXES
+-- =============================================================================
+
+CREATE INDEX idx_wo_open_by_user ON work_orders(assigned_to, status)
+    WHERE status IN ('OPEN', 'IN_PROGRESS');
+CREATE INDEX idx_pm_schedule_due_open ON pm_schedule(due_date)
+    WHERE status IN ('SCHEDULED', 'DUE', 'OVERDUE');
+CREATE INDEX idx_assets_company_status ON assets(company_id, status);
+CREATE INDEX idx_cost_entries_wo_type ON cost_entries(work_order_id, type);
+
+-- Single-column indexes that are now prefixes of the composites above
+DROP INDEX IF EXISTS idx_assets_company_id;
+DROP INDEX IF EXISTS idx_cost_entries_work_order_id;
@@ -0,0 +1,9 @@
+-- Migration 009: JSONB GIN Indexes
+-- Index-backed containment queries (@>) on work order metadata and audit values
+
+-- =============================================================================
+-- JSONB GIN INDEXES
+-- =============================================================================
+
+CREATE INDEX idx_wo_meta_gin ON work_orders USING gin(metadata);
+CREATE INDEX idx_audit_log_new_values_gin ON audit_log USING gin(new_values);
@@ -0,0 +1,83 @@
+-- Migration 010: Partition Audit Log
+-- Convert audit_log to monthly RANGE partitions on changed_at so time-range
+-- queries prune partitions and old months can be dropped instead of deleted
+
+-- =============================================================================
+-- PARTITIONED AUDIT LOG
+-- =============================================================================
+
+ALTER TABLE audit_log RENAME TO audit_log_unpartitioned;
+
+-- Free the constraint names for the partitioned table
+ALTER TABLE audit_log_unpartitioned RENAME CONSTRAINT audit_log_pkey TO audit_log_unpartitioned_pkey;
+ALTER TABLE audit_log_unpartitioned RENAME CONSTRAINT audit_log_changed_by_fkey TO audit_log_unpartitioned_changed_by_fkey;
+
+-- The partition key must be part of the primary key
+CREATE TABLE audit_log (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    table_name VARCHAR(100) NOT NULL,
+    record_id UUID NOT NULL,
+    operation VARCHAR(20) NOT NULL,
+    old_values JSONB,
+    new_values JSONB,
+    changed_by UUID,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    client_info JSONB,
+    CONSTRAINT audit_log_pkey PRIMARY KEY (id, changed_at),
+    CONSTRAINT audit_log_changed_by_fkey FOREIGN KEY (changed_by) REFERENCES users(id) ON DELETE SET NULL
+) PARTITION BY RANGE (changed_at);
+
+-- Catch-all so an insert outside the created months never fails
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
+
+-- Create monthly partitions from from_month through months_ahead months past
+-- the current month; returns how many were created. Run ahead of time (see
+-- run_maintenance_tasks): a month whose rows already sit in the default
+-- partition cannot be split out.
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(
+    from_month DATE DEFAULT CURRENT_DATE,
+    months_ahead INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', from_month),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        partition_name := format('audit_log_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_log FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions covering the existing rows, then move them across
+SELECT ensure_audit_log_partitions(
+    COALESCE((SELECT MIN(changed_at) FROM audit_log_unpartitioned)::date, CURRENT_DATE)
+);
+
+INSERT INTO audit_log (id, table_name, record_id, operation, old_values, new_values, changed_by, changed_at, client_info)
+SELECT id, table_name, record_id, operation, old_values, new_values, changed_by,
+       COALESCE(changed_at, CURRENT_TIMESTAMP), client_info
+FROM audit_log_unpartitioned;
+
+DROP TABLE audit_log_unpartitioned;
+
+-- Indexes on the parent cascade to every partition
+CREATE INDEX idx_audit_log_table_record ON audit_log(table_name, record_id);
+CREATE INDEX idx_audit_log_changed_at ON audit_log(changed_at);
+CREATE INDEX idx_audit_log_changed_by ON audit_log(changed_by);
+CREATE INDEX idx_audit_log_table_date ON audit_log(table_name, changed_at);
+CREATE INDEX idx_audit_log_new_values_gin ON audit_log USING gin(new_values);
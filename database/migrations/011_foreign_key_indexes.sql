@@ -0,0 +1,80 @@
+-- Migration 011: Foreign Key Indexes and Delete Actions
+-- Index every child foreign key so referential checks on parent deletes
+-- use an index lookup, and null out optional references instead of
+-- blocking the delete of users, assets and work orders
+
+-- =============================================================================
+-- FOREIGN KEY DELETE ACTIONS
+-- =============================================================================
+
+ALTER TABLE assets
+    DROP CONSTRAINT assets_parent_asset_id_fkey,
+    ADD CONSTRAINT assets_parent_asset_id_fkey
+        FOREIGN KEY (parent_asset_id) REFERENCES assets(id) ON DELETE SET NULL;
+
+ALTER TABLE work_orders
+    DROP CONSTRAINT work_orders_asset_id_fkey,
+    ADD CONSTRAINT work_orders_asset_id_fkey
+        FOREIGN KEY (asset_id) REFERENCES assets(id) ON DELETE SET NULL,
+    DROP CONSTRAINT work_orders_assigned_to_fkey,
+    ADD CONSTRAINT work_orders_assigned_to_fkey
+        FOREIGN KEY (assigned_to) REFERENCES users(id) ON DELETE SET NULL,
+    DROP CONSTRAINT work_orders_created_by_fkey,
+    ADD CONSTRAINT work_orders_created_by_fkey
+        FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE cost_entries
+    DROP CONSTRAINT cost_entries_created_by_fkey,
+    ADD CONSTRAINT cost_entries_created_by_fkey
+        FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE approvals
+    DROP CONSTRAINT approvals_approver_id_fkey,
+    ADD CONSTRAINT approvals_approver_id_fkey
+        FOREIGN KEY (approver_id) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE pm_tasks
+    DROP CONSTRAINT pm_tasks_created_by_fkey,
+    ADD CONSTRAINT pm_tasks_created_by_fkey
+        FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE pm_schedule
+    DROP CONSTRAINT pm_schedule_assigned_to_fkey,
+    ADD CONSTRAINT pm_schedule_assigned_to_fkey
+        FOREIGN KEY (assigned_to) REFERENCES users(id) ON DELETE SET NULL,
+    DROP CONSTRAINT pm_schedule_work_order_id_fkey,
+    ADD CONSTRAINT pm_schedule_work_order_id_fkey
+        FOREIGN KEY (work_order_id) REFERENCES work_orders(id) ON DELETE SET NULL;
+
+ALTER TABLE meter_readings
+    DROP CONSTRAINT meter_readings_read_by_fkey,
+    ADD CONSTRAINT meter_readings_read_by_fkey
+        FOREIGN KEY (read_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE stock_movements
+    DROP CONSTRAINT stock_movements_created_by_fkey,
+    ADD CONSTRAINT stock_movements_created_by_fkey
+        FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL;
+
+ALTER TABLE documents
+    DROP CONSTRAINT documents_uploaded_by_fkey,
+    ADD CONSTRAINT documents_uploaded_by_fkey
+        FOREIGN KEY (uploaded_by) REFERENCES users(id) ON DELETE SET NULL;
+
+-- =============================================================================
+-- FOREIGN KEY INDEXES
+-- =============================================================================
+
+CREATE INDEX idx_assets_parent_asset_id ON assets(parent_asset_id);
+CREATE INDEX idx_work_orders_created_by ON work_orders(created_by);
+CREATE INDEX idx_cost_entries_created_by ON cost_entries(created_by);
+CREATE INDEX idx_budgets_company_id ON budgets(company_id);
+CREATE INDEX idx_approvals_work_order_id ON approvals(work_order_id);
+CREATE INDEX idx_approvals_approver_id ON approvals(approver_id);
+CREATE INDEX idx_sla_templates_company_id ON sla_templates(company_id);
+CREATE INDEX idx_assignment_rules_company_id ON assignment_rules(company_id);
+CREATE INDEX idx_pm_tasks_created_by ON pm_tasks(created_by);
+CREATE INDEX idx_pm_schedule_work_order_id ON pm_schedule(work_order_id);
+CREATE INDEX idx_meter_readings_read_by ON meter_readings(read_by);
+CREATE INDEX idx_inventory_items_company_id ON inventory_items(company_id);
+CREATE INDEX idx_stock_movements_created_by ON stock_movements(created_by);
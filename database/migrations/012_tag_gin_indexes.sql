@@ -0,0 +1,10 @@
+-- Migration 012: Tag GIN Indexes
+-- Index-backed tag filters on work orders and documents; query with
+-- tags @> ARRAY['x'] or tags && ARRAY[...] (= ANY(tags) cannot use the index)
+
+-- =============================================================================
+-- TAG GIN INDEXES
+-- =============================================================================
+
+CREATE INDEX idx_wo_tags_gin ON work_orders USING gin(tags);
+CREATE INDEX idx_docs_tags_gin ON documents USING gin(tags);
@@ -0,0 +1,71 @@
+-- Migration 013: Audit Log Partition Recovery
+-- Let ensure_audit_log_partitions recover months whose rows landed in the
+-- default partition, and create each month independently so one failure
+-- does not roll back the rest
+
+-- =============================================================================
+-- PARTITION MAINTENANCE
+-- =============================================================================
+
+-- Create monthly partitions from from_month (or the oldest month held by the
+-- default partition) through months_ahead months past the current month;
+-- returns how many were created. Rows of a month that already sit in the
+-- default partition are moved into the new partition before it is attached.
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(
+    from_month DATE DEFAULT CURRENT_DATE,
+    months_ahead INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    from_month := LEAST(
+        from_month,
+        COALESCE((SELECT MIN(changed_at) FROM audit_log_default)::date, from_month)
+    );
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', from_month),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        partition_name := format('audit_log_%s', to_char(month_start, 'YYYY_MM'));
+        month_end := (month_start + interval '1 month')::date;
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM audit_log_default
+                WHERE changed_at >= month_start AND changed_at < month_end
+            ) THEN
+                -- Move the month out of the default partition, then attach
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE audit_log INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM audit_log_default
+                                    WHERE changed_at >= %L AND changed_at < %L RETURNING *)
+                     INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE audit_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_log FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'Could not create audit log partition %: %', partition_name, SQLERRM;
+        END;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
@@ -6,23 +6,23 @@ Used by Alembic for migrations and schema management
 from sqlalchemy import (
     Column, String, Integer, Boolean, DateTime, Text, 
     Numeric, Date, UUID, ForeignKey, Index, CheckConstraint,
-    ARRAY, JSON
+    ARRAY, text
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import ENUM
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
 import uuid
 
 Base = declarative_base()
 
-# Define custom enums
-cost_type_enum = ENUM('LABOR', 'PART', 'SERVICE', 'MISC', name='cost_type')
-approval_state_enum = ENUM('PENDING', 'APPROVED', 'REJECTED', name='approval_state')
-decision_type_enum = ENUM('APPROVE', 'REJECT', name='decision_type')
-pm_trigger_type_enum = ENUM('TIME_BASED', 'METER_BASED', 'CONDITION_BASED', 'EVENT_BASED', name='pm_trigger_type')
-pm_frequency_enum = ENUM('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'SEMI_ANNUALLY', 'ANNUALLY', 'CUSTOM', name='pm_frequency')
-pm_status_enum = ENUM('ACTIVE', 'INACTIVE', 'SUSPENDED', name='pm_status')
-pm_task_status_enum = ENUM('SCHEDULED', 'DUE', 'OVERDUE', 'COMPLETED', 'SKIPPED', name='pm_task_status')
+# Define custom enums; the types are created by the migrations, not per table
+cost_type_enum = ENUM('LABOR', 'PART', 'SERVICE', 'MISC', name='cost_type', create_type=False)
+approval_state_enum = ENUM('PENDING', 'APPROVED', 'REJECTED', name='approval_state', create_type=False)
+decision_type_enum = ENUM('APPROVE', 'REJECT', name='decision_type', create_type=False)
+pm_trigger_type_enum = ENUM('TIME_BASED', 'METER_BASED', 'CONDITION_BASED', 'EVENT_BASED', name='pm_trigger_type', create_type=False)
+pm_frequency_enum = ENUM('DAILY', 'WEEKLY', 'MONTHLY', 'QUARTERLY', 'SEMI_ANNUALLY', 'ANNUALLY', 'CUSTOM', name='pm_frequency', create_type=False)
+pm_status_enum = ENUM('ACTIVE', 'INACTIVE', 'SUSPENDED', name='pm_status', create_type=False)
+pm_task_status_enum = ENUM('SCHEDULED', 'DUE', 'OVERDUE', 'COMPLETED', 'SKIPPED', name='pm_task_status', create_type=False)
 
 class Company(Base):
     __tablename__ = 'companies'
@@ -31,7 +31,7 @@ class Company(Base):
     name = Column(String(255), nullable=False)
     location = Column(String(255))
     setup_date = Column(Date, default=func.current_date())
-    settings = Column(JSON, default={})
+    settings = Column(JSONB, server_default=text("'{}'::jsonb"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -67,8 +67,8 @@ class Asset(Base):
     last_maintenance = Column(DateTime(timezone=True))
     criticality = Column(String(20), default='MEDIUM')
     company_id = Column(UUID(as_uuid=True), ForeignKey('companies.id'))
-    parent_asset_id = Column(UUID(as_uuid=True), ForeignKey('assets.id'))
-    meta = Column('metadata', JSON, default={})
+    parent_asset_id = Column(UUID(as_uuid=True), ForeignKey('assets.id', ondelete='SET NULL'))
+    meta = Column('metadata', JSONB, server_default=text("'{}'::jsonb"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -82,9 +82,9 @@ class WorkOrder(Base):
     priority = Column(String(20), default='MEDIUM')
     status = Column(String(50), default='OPEN')
     work_type = Column(String(50), default='CORRECTIVE')
-    asset_id = Column(UUID(as_uuid=True), ForeignKey('assets.id'))
-    assigned_to = Column(UUID(as_uuid=True), ForeignKey('users.id'))
-    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    asset_id = Column(UUID(as_uuid=True), ForeignKey('assets.id', ondelete='SET NULL'))
+    assigned_to = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
+    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     requested_date = Column(DateTime(timezone=True), server_default=func.now())
     scheduled_date = Column(DateTime(timezone=True))
     started_date = Column(DateTime(timezone=True))
@@ -94,7 +94,7 @@ class WorkOrder(Base):
     instructions = Column(Text)
     completion_notes = Column(Text)
     tags = Column(ARRAY(Text))
-    meta = Column('metadata', JSON, default={})
+    meta = Column('metadata', JSONB, server_default=text("'{}'::jsonb"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -106,8 +106,8 @@ class CostEntry(Base):
     type = Column(cost_type_enum, nullable=False)
     amount = Column(Numeric(12, 2), nullable=False)
     description = Column(Text)
-    meta = Column(JSON, default={})
-    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    meta = Column(JSONB, server_default=text("'{}'::jsonb"))
+    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Budget(Base):
@@ -131,7 +131,7 @@ class Approval(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     work_order_id = Column(UUID(as_uuid=True), ForeignKey('work_orders.id', ondelete='CASCADE'))
-    approver_id = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    approver_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     state = Column(approval_state_enum, default='PENDING')
     decision = Column(decision_type_enum)
     note = Column(Text)
@@ -156,7 +156,7 @@ class AssignmentRule(Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(255), nullable=False)
-    json_rule = Column(JSON, nullable=False)
+    json_rule = Column(JSONB, nullable=False)
     active = Column(Boolean, default=True)
     priority = Column(Integer, default=0)
     company_id = Column(UUID(as_uuid=True), ForeignKey('companies.id'))
@@ -185,7 +185,7 @@ class PMTask(Base):
     last_completed = Column(DateTime(timezone=True))
     next_due = Column(DateTime(timezone=True))
     completion_count = Column(Integer, default=0)
-    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -197,8 +197,8 @@ class PMSchedule(Base):
     scheduled_date = Column(DateTime(timezone=True), nullable=False)
     due_date = Column(DateTime(timezone=True), nullable=False)
     status = Column(pm_task_status_enum, default='SCHEDULED')
-    assigned_to = Column(UUID(as_uuid=True), ForeignKey('users.id'))
-    work_order_id = Column(UUID(as_uuid=True), ForeignKey('work_orders.id'))
+    assigned_to = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
+    work_order_id = Column(UUID(as_uuid=True), ForeignKey('work_orders.id', ondelete='SET NULL'))
     completion_date = Column(DateTime(timezone=True))
     completion_notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -212,7 +212,7 @@ class MeterReading(Base):
     meter_type = Column(String(50), nullable=False)
     reading = Column(Numeric(15, 3), nullable=False)
     reading_date = Column(DateTime(timezone=True), server_default=func.now())
-    read_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    read_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     notes = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -248,7 +248,7 @@ class StockMovement(Base):
     reference_type = Column(String(50))  # 'WORK_ORDER', 'PURCHASE', 'ADJUSTMENT'
     reference_id = Column(UUID(as_uuid=True))
     notes = Column(Text)
-    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    created_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Document(Base):
@@ -265,7 +265,7 @@ class Document(Base):
     reference_id = Column(UUID(as_uuid=True))
     tags = Column(ARRAY(Text))
     description = Column(Text)
-    uploaded_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
+    uploaded_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class SyncStatus(Base):
@@ -285,24 +285,56 @@ class SyncStatus(Base):
 
 class AuditLog(Base):
     __tablename__ = 'audit_log'
+    # Monthly partitions are created by ensure_audit_log_partitions() (migration 010)
+    __table_args__ = {'postgresql_partition_by': 'RANGE (changed_at)'}
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     table_name = Column(String(100), nullable=False)
     record_id = Column(UUID(as_uuid=True), nullable=False)
     operation = Column(String(20), nullable=False)
-    old_values = Column(JSON)
-    new_values = Column(JSON)
-    changed_by = Column(UUID(as_uuid=True), ForeignKey('users.id'))
-    changed_at = Column(DateTime(timezone=True), server_default=func.now())
-    client_info = Column(JSON)
+    old_values = Column(JSONB)
+    new_values = Column(JSONB)
+    changed_by = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='SET NULL'))
+    changed_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    client_info = Column(JSONB)
 
 # Indexes for performance
-Index('idx_assets_company_id', Asset.company_id)
+Index('idx_assets_company_status', Asset.company_id, Asset.status)
 Index('idx_assets_status', Asset.status)
 Index('idx_work_orders_asset_id', WorkOrder.asset_id)
 Index('idx_work_orders_assigned_to', WorkOrder.assigned_to)
 Index('idx_work_orders_status', WorkOrder.status)
-Index('idx_cost_entries_work_order_id', CostEntry.work_order_id)
+Index(
+    'idx_wo_open_by_user', WorkOrder.assigned_to, WorkOrder.status,
+    postgresql_where=WorkOrder.status.in_(['OPEN', 'IN_PROGRESS'])
+)
+Index('idx_cost_entries_wo_type', CostEntry.work_order_id, CostEntry.type)
 Index('idx_pm_tasks_asset_id', PMTask.asset_id)
 Index('idx_pm_schedule_due_date', PMSchedule.due_date)
-Index('idx_sync_status_client_id', SyncStatus.client_id)
\ No newline at end of file
+Index(
+    'idx_pm_schedule_due_open', PMSchedule.due_date,
+    postgresql_where=PMSchedule.status.in_(['SCHEDULED', 'DUE', 'OVERDUE'])
+)
+Index('idx_sync_status_client_id', SyncStatus.client_id)
+
+# Foreign key indexes (referential checks on parent deletes)
+Index('idx_assets_parent_asset_id', Asset.parent_asset_id)
+Index('idx_work_orders_created_by', WorkOrder.created_by)
+Index('idx_cost_entries_created_by', CostEntry.created_by)
+Index('idx_budgets_company_id', Budget.company_id)
+Index('idx_approvals_work_order_id', Approval.work_order_id)
+Index('idx_approvals_approver_id', Approval.approver_id)
+Index('idx_sla_templates_company_id', SLATemplate.company_id)
+Index('idx_assignment_rules_company_id', AssignmentRule.company_id)
+Index('idx_pm_tasks_created_by', PMTask.created_by)
+Index('idx_pm_schedule_work_order_id', PMSchedule.work_order_id)
+Index('idx_meter_readings_read_by', MeterReading.read_by)
+Index('idx_inventory_items_company_id', InventoryItem.company_id)
+Index('idx_stock_movements_created_by', StockMovement.created_by)
+Index('idx_documents_uploaded_by', Document.uploaded_by)
+Index('idx_audit_log_changed_by', AuditLog.changed_by)
+
+Index('idx_wo_meta_gin', WorkOrder.meta, postgresql_using='gin')
+Index('idx_audit_log_new_values_gin', AuditLog.new_values, postgresql_using='gin')
+Index('idx_wo_tags_gin', WorkOrder.tags, postgresql_using='gin')
+Index('idx_docs_tags_gin', Document.tags, postgresql_using='gin')
\ No newline at end of file
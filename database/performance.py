@@ -5,8 +5,9 @@ Handles query optimization, index management, and performance analytics
 
 import asyncio
 import asyncpg
+import time
 from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import json
 
@@ -14,11 +15,24 @@ from .config import db_manager
 
 logger = logging.getLogger(__name__)
 
+# VACUUM is heavy on server I/O; keep concurrent runs low
+MAX_PARALLEL_VACUUMS = 4
+
+def _rows_to_dicts(rows: List[asyncpg.Record]) -> List[Dict[str, Any]]:
+    """Convert records to dicts, reading the column names once per result set"""
+    if not rows:
+        return []
+    keys = tuple(rows[0].keys())
+    return [dict(zip(keys, row.values())) for row in rows]
+
 class DatabasePerformanceMonitor:
     """Monitor and optimize database performance"""
     
     def __init__(self):
         self.slow_query_threshold = 1000  # 1 second in milliseconds
+        self.query_stats_check_ttl = 300  # Re-check pg_stat_statements every 5 minutes
+        self._stats_enabled: Optional[bool] = None
+        self._stats_checked_at: float = 0
         
     async def analyze_query_performance(self) -> Dict[str, Any]:
         """Analyze query performance and identify slow queries"""
@@ -26,17 +40,20 @@ class DatabasePerformanceMonitor:
             # Enable query statistics if not already enabled
             await self._ensure_query_stats_enabled()
             
-            # Get slow queries
-            slow_queries = await self._get_slow_queries()
-            
-            # Get index usage statistics
-            index_stats = await self._get_index_usage_stats()
-            
-            # Get table statistics
-            table_stats = await self._get_table_stats()
-            
-            # Get database size information
-            db_size = await self._get_database_size_info()
+            # Slow queries, index usage, table statistics and size information are
+            # independent; each helper acquires its own pooled connection
+            results = await asyncio.gather(
+                self._get_slow_queries(),
+                self._get_index_usage_stats(),
+                self._get_table_stats(),
+                self._get_database_size_info(),
+                self._get_maintenance_candidates(),
+                return_exceptions=True
+            )
+            slow_queries, index_stats, table_stats, db_size, maintenance_candidates = [
+                self._result_or_default(result, default)
+                for result, default in zip(results, ([], [], [], {}, []))
+            ]
             
             return {
                 'timestamp': datetime.now().isoformat(),
@@ -44,8 +61,8 @@ class DatabasePerformanceMonitor:
                 'index_usage': index_stats,
                 'table_statistics': table_stats,
                 'database_size': db_size,
-                'performance_recommendations': await self._generate_recommendations(
-                    slow_queries, index_stats, table_stats
+                'performance_recommendations': self._generate_recommendations(
+                    slow_queries, index_stats, maintenance_candidates
                 )
             }
             
@@ -53,13 +70,29 @@ class DatabasePerformanceMonitor:
             logger.error(f"Error analyzing query performance: {e}")
             return {'error': str(e)}
     
+    @staticmethod
+    def _result_or_default(result: Any, default: Any) -> Any:
+        """Substitute an empty result for an exception returned by gather"""
+        if isinstance(result, BaseException):
+            logger.error(f"Performance analysis step failed: {result}")
+            return default
+        return result
+    
     async def _ensure_query_stats_enabled(self):
-        """Ensure pg_stat_statements extension is enabled"""
+        """Ensure pg_stat_statements extension is enabled (cached for query_stats_check_ttl seconds)"""
+        if (
+            self._stats_enabled is not None
+            and time.monotonic() - self._stats_checked_at < self.query_stats_check_ttl
+        ):
+            return self._stats_enabled
+        
         try:
             # Check if pg_stat_statements is available
             exists = await db_manager.fetchval(
                 "SELECT EXISTS(SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements')"
             )
+            self._stats_enabled = bool(exists)
+            self._stats_checked_at = time.monotonic()
             
             if not exists:
                 logger.warning("pg_stat_statements extension not available - some performance metrics will be limited")
@@ -90,7 +123,7 @@ class DatabasePerformanceMonitor:
             """
             
             rows = await db_manager.fetch(query, self.slow_query_threshold)
-            return [dict(row) for row in rows]
+            return _rows_to_dicts(rows)
             
         except Exception as e:
             logger.warning(f"Could not fetch slow queries: {e}")
@@ -118,7 +151,7 @@ class DatabasePerformanceMonitor:
             """
             
             rows = await db_manager.fetch(query)
-            return [dict(row) for row in rows]
+            return _rows_to_dicts(rows)
             
         except Exception as e:
             logger.error(f"Error getting index usage stats: {e}")
@@ -130,7 +163,7 @@ class DatabasePerformanceMonitor:
             query = """
             SELECT 
                 schemaname,
-                tablename,
+                relname as tablename,
                 n_tup_ins as inserts,
                 n_tup_upd as updates,
                 n_tup_del as deletes,
@@ -140,18 +173,39 @@ class DatabasePerformanceMonitor:
                 last_autovacuum,
                 last_analyze,
                 last_autoanalyze,
-                pg_size_pretty(pg_total_relation_size(schemaname||'.'||tablename)) as size
+                pg_size_pretty(pg_total_relation_size(relid)) as size
             FROM pg_stat_user_tables
-            ORDER BY pg_total_relation_size(schemaname||'.'||tablename) DESC
+            ORDER BY pg_total_relation_size(relid) DESC
             """
             
             rows = await db_manager.fetch(query)
-            return [dict(row) for row in rows]
+            return _rows_to_dicts(rows)
             
         except Exception as e:
             logger.error(f"Error getting table stats: {e}")
             return []
     
+    async def _get_maintenance_candidates(self) -> List[Dict[str, Any]]:
+        """Get tables with a high dead tuple ratio or stale planner statistics"""
+        try:
+            query = """
+            SELECT relname AS tablename, 'vacuum' AS reason
+            FROM pg_stat_user_tables
+            WHERE n_dead_tup > n_live_tup * 0.1
+            UNION ALL
+            SELECT relname AS tablename, 'analyze' AS reason
+            FROM pg_stat_user_tables
+            WHERE COALESCE(last_analyze, last_autoanalyze) IS NULL
+               OR COALESCE(last_analyze, last_autoanalyze) < now() - interval '7 days'
+            """
+            
+            rows = await db_manager.fetch(query)
+            return _rows_to_dicts(rows)
+            
+        except Exception as e:
+            logger.error(f"Error getting maintenance candidates: {e}")
+            return []
+    
     async def _get_database_size_info(self) -> Dict[str, Any]:
         """Get database size and space usage information"""
         try:
@@ -176,18 +230,18 @@ class DatabasePerformanceMonitor:
             
             return {
                 'total_database_size': db_size,
-                'largest_tables': [dict(row) for row in table_sizes]
+                'largest_tables': _rows_to_dicts(table_sizes)
             }
             
         except Exception as e:
             logger.error(f"Error getting database size info: {e}")
             return {}
     
-    async def _generate_recommendations(
+    def _generate_recommendations(
         self, 
         slow_queries: List[Dict], 
         index_stats: List[Dict], 
-        table_stats: List[Dict]
+        maintenance_candidates: List[Dict]
     ) -> List[str]:
         """Generate performance optimization recommendations"""
         recommendations = []
@@ -201,16 +255,11 @@ class DatabasePerformanceMonitor:
         if unused_indexes:
             recommendations.append(f"Found {len(unused_indexes)} unused indexes - consider dropping them")
         
-        # Check for tables with high dead tuple ratio
-        for table in table_stats:
-            if table.get('dead_tuples', 0) > table.get('live_tuples', 0) * 0.1:
+        # Tables with a high dead tuple ratio or no ANALYZE in the last week (filtered in SQL)
+        for table in maintenance_candidates:
+            if table['reason'] == 'vacuum':
                 recommendations.append(f"Table {table['tablename']} has high dead tuple ratio - consider VACUUM")
-        
-        # Check for tables that haven't been analyzed recently
-        week_ago = datetime.now() - timedelta(days=7)
-        for table in table_stats:
-            last_analyze = table.get('last_analyze') or table.get('last_autoanalyze')
-            if not last_analyze or last_analyze < week_ago:
+            else:
                 recommendations.append(f"Table {table['tablename']} needs ANALYZE for query planning")
         
         return recommendations
@@ -274,14 +323,16 @@ class DatabasePerformanceMonitor:
             }
         ]
         
-        for rec in index_recommendations:
-            # Check if index already exists
-            exists = await db_manager.fetchval(
-                "SELECT EXISTS(SELECT 1 FROM pg_indexes WHERE indexname = $1)",
-                rec['name']
+        # Look up which recommended indexes already exist in one round-trip
+        existing = {
+            row['indexname'] for row in await db_manager.fetch(
+                "SELECT indexname FROM pg_indexes WHERE indexname = ANY($1::text[])",
+                [rec['name'] for rec in index_recommendations]
             )
-            
-            if not exists:
+        }
+        
+        for rec in index_recommendations:
+            if rec['name'] not in existing:
                 recommendations.append({
                     'index_name': rec['name'],
                     'create_sql': f"CREATE INDEX CONCURRENTLY {rec['name']} ON {rec['table']} {rec['columns']}",
@@ -300,18 +351,23 @@ class DatabasePerformanceMonitor:
                 "SELECT tablename FROM pg_tables WHERE schemaname = 'public'"
             )
             
-            for table_row in tables:
-                table_name = table_row['tablename']
-                try:
-                    # Use VACUUM ANALYZE which combines both operations
-                    await db_manager.execute(f'VACUUM ANALYZE "{table_name}"')
-                    results['vacuumed_tables'].append(table_name)
-                    logger.info(f"VACUUM ANALYZE completed for table: {table_name}")
-                    
-                except Exception as e:
-                    error_msg = f"VACUUM ANALYZE failed for {table_name}: {e}"
-                    results['errors'].append(error_msg)
-                    logger.error(error_msg)
+            semaphore = asyncio.Semaphore(MAX_PARALLEL_VACUUMS)
+            
+            async def vacuum_table(table_name: str):
+                # Each run takes its own pooled connection (VACUUM cannot run in a transaction)
+                async with semaphore:
+                    try:
+                        # Use VACUUM ANALYZE which combines both operations
+                        await db_manager.execute(f'VACUUM ANALYZE "{table_name}"')
+                        results['vacuumed_tables'].append(table_name)
+                        logger.info(f"VACUUM ANALYZE completed for table: {table_name}")
+                        
+                    except Exception as e:
+                        error_msg = f"VACUUM ANALYZE failed for {table_name}: {e}"
+                        results['errors'].append(error_msg)
+                        logger.error(error_msg)
+            
+            await asyncio.gather(*(vacuum_table(row['tablename']) for row in tables))
             
         except Exception as e:
             logger.error(f"Error during VACUUM ANALYZE operation: {e}")
@@ -434,6 +490,10 @@ async def run_maintenance_tasks():
         refreshed_views = await query_optimizer.refresh_materialized_views()
         logger.info(f"Refreshed {len(refreshed_views)} materialized views")
         
+        # Create upcoming audit log partitions before rows need them
+        created_partitions = await db_manager.fetchval("SELECT ensure_audit_log_partitions()")
+        logger.info(f"Created {created_partitions} audit log partitions")
+        
         # Generate performance report
         perf_report = await performance_monitor.analyze_query_performance()
         
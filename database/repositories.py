@@ -3,7 +3,7 @@ Database repositories for ChatterFix CMMS
 Data access layer for all database operations
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import asyncpg
 import uuid
@@ -33,6 +33,26 @@ class BaseRepository(ABC):
     async def _fetchval(self, query: str, *args):
         """Fetch a single value"""
         return await self.db_manager.fetchval(query, *args)
+    
+    async def _fetch_page(
+        self, query: str, count_query: str, limit: int, offset: int, *args
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Fetch a page of rows from a query selecting COUNT(*) OVER () AS total_count.
+        
+        query takes the filter args followed by limit and offset; count_query takes
+        only the filter args and is run when a page past the first comes back empty,
+        since the window count is then unavailable.
+        """
+        rows = [dict(row) for row in await self._fetch(query, *args, limit, offset)]
+        if rows:
+            total = rows[0]['total_count']
+        elif offset > 0:
+            total = await self._fetchval(count_query, *args)
+        else:
+            total = 0
+        for row in rows:
+            del row['total_count']
+        return rows, total
 
 class WorkOrderRepository(BaseRepository):
     """Repository for work order operations"""
@@ -96,8 +116,17 @@ class WorkOrderRepository(BaseRepository):
         rows = await self._fetch(query, limit, offset)
         return [dict(row) for row in rows]
     
-    async def update(self, work_order_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update work order"""
+    async def update(
+        self,
+        work_order_id: str,
+        update_data: Dict[str, Any],
+        expected_max_updated_at: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update work order.
+        
+        With expected_max_updated_at, the row is only updated if it has not changed
+        since that time; None is returned when it has (or the row does not exist).
+        """
         # Build dynamic update query
         set_clauses = []
         values = []
@@ -112,22 +141,58 @@ class WorkOrderRepository(BaseRepository):
         if not set_clauses:
             return None
         
+        where_clause = f"id = ${param_count}"
+        values.append(work_order_id)
+        if expected_max_updated_at is not None:
+            where_clause += f" AND (updated_at IS NULL OR updated_at <= ${param_count + 1})"
+            values.append(expected_max_updated_at)
+        
         query = f"""
         UPDATE work_orders 
         SET {', '.join(set_clauses)}, updated_at = CURRENT_TIMESTAMP
-        WHERE id = ${param_count}
+        WHERE {where_clause}
         RETURNING *
         """
-        values.append(work_order_id)
         
         row = await self._fetchrow(query, *values)
         return dict(row) if row else None
     
-    async def delete(self, work_order_id: str) -> bool:
-        """Delete work order"""
-        query = "DELETE FROM work_orders WHERE id = $1"
-        result = await self._execute(query, work_order_id)
+    async def delete(self, work_order_id: str, expected_max_updated_at: Optional[datetime] = None) -> bool:
+        """Delete work order (only if unchanged since expected_max_updated_at, when given)"""
+        if expected_max_updated_at is None:
+            query = "DELETE FROM work_orders WHERE id = $1"
+            result = await self._execute(query, work_order_id)
+        else:
+            query = """
+            DELETE FROM work_orders
+            WHERE id = $1 AND (updated_at IS NULL OR updated_at <= $2)
+            """
+            result = await self._execute(query, work_order_id, expected_max_updated_at)
         return result == "DELETE 1"
+    
+    async def delete_many(
+        self,
+        work_order_ids: List[str],
+        expected_max_updated_at: Optional[List[datetime]] = None
+    ) -> List[str]:
+        """Delete several work orders, returning the IDs that were deleted.
+        
+        expected_max_updated_at, if given, holds one timestamp per ID; rows changed
+        after their timestamp are left in place.
+        """
+        if expected_max_updated_at is None:
+            query = "DELETE FROM work_orders WHERE id = ANY($1::uuid[]) RETURNING id"
+            rows = await self._fetch(query, work_order_ids)
+        else:
+            query = """
+            DELETE FROM work_orders wo
+            USING unnest($1::uuid[], $2::timestamptz[]) AS d(id, expected_max_updated_at)
+            WHERE wo.id = d.id
+              AND (wo.updated_at IS NULL OR wo.updated_at <= d.expected_max_updated_at)
+            RETURNING wo.id
+            """
+            rows = await self._fetch(query, work_order_ids, expected_max_updated_at)
+        return [str(row['id']) for row in rows]
 
 class CostEntryRepository(BaseRepository):
     """Repository for cost entry operations"""
@@ -237,6 +302,20 @@ class PMTaskRepository(BaseRepository):
         rows = await self._fetch(query)
         return [dict(row) for row in rows]
     
+    async def get_page(self, limit: int = 100, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of active PM tasks and the total active task count"""
+        query = """
+        SELECT pt.*, a.name as asset_name, COUNT(*) OVER () AS total_count
+        FROM pm_tasks pt
+        LEFT JOIN assets a ON pt.asset_id = a.id
+        WHERE pt.status = 'ACTIVE'
+        ORDER BY pt.name
+        LIMIT $1 OFFSET $2
+        """
+        count_query = "SELECT COUNT(*) FROM pm_tasks WHERE status = 'ACTIVE'"
+        
+        return await self._fetch_page(query, count_query, limit, offset)
+    
     async def get_by_id(self, pm_task_id: str) -> Optional[Dict[str, Any]]:
         """Get PM task by ID"""
         query = """
@@ -305,6 +384,19 @@ class AssetRepository(BaseRepository):
         rows = await self._fetch(query)
         return [dict(row) for row in rows]
     
+    async def get_page(self, limit: int = 100, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of assets and the total asset count"""
+        query = """
+        SELECT *, COUNT(*) OVER () AS total_count
+        FROM assets
+        WHERE status != 'DELETED'
+        ORDER BY name
+        LIMIT $1 OFFSET $2
+        """
+        count_query = "SELECT COUNT(*) FROM assets WHERE status != 'DELETED'"
+        
+        return await self._fetch_page(query, count_query, limit, offset)
+    
     async def get_by_id(self, asset_id: str) -> Optional[Dict[str, Any]]:
         """Get asset by ID"""
         query = "SELECT * FROM assets WHERE id = $1"
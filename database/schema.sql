@@ -54,7 +54,7 @@ CREATE TABLE assets (
     last_maintenance TIMESTAMP WITH TIME ZONE,
     criticality VARCHAR(20) DEFAULT 'MEDIUM',
     company_id UUID REFERENCES companies(id),
-    parent_asset_id UUID REFERENCES assets(id),
+    parent_asset_id UUID REFERENCES assets(id) ON DELETE SET NULL,
     metadata JSONB DEFAULT '{}',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
@@ -69,9 +69,9 @@ CREATE TABLE work_orders (
     priority VARCHAR(20) DEFAULT 'MEDIUM',
     status VARCHAR(50) DEFAULT 'OPEN',
     work_type VARCHAR(50) DEFAULT 'CORRECTIVE',
-    asset_id UUID REFERENCES assets(id),
-    assigned_to UUID REFERENCES users(id),
-    created_by UUID REFERENCES users(id),
+    asset_id UUID REFERENCES assets(id) ON DELETE SET NULL,
+    assigned_to UUID REFERENCES users(id) ON DELETE SET NULL,
+    created_by UUID REFERENCES users(id) ON DELETE SET NULL,
     requested_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     scheduled_date TIMESTAMP WITH TIME ZONE,
     started_date TIMESTAMP WITH TIME ZONE,
@@ -101,7 +101,7 @@ CREATE TABLE cost_entries (
     amount DECIMAL(12,2) NOT NULL,
     description TEXT,
     meta JSONB DEFAULT '{}',
-    created_by UUID REFERENCES users(id),
+    created_by UUID REFERENCES users(id) ON DELETE SET NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -133,7 +133,7 @@ CREATE TYPE decision_type AS ENUM ('APPROVE', 'REJECT');
 CREATE TABLE approvals (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     work_order_id UUID REFERENCES work_orders(id) ON DELETE CASCADE,
-    approver_id UUID REFERENCES users(id),
+    approver_id UUID REFERENCES users(id) ON DELETE SET NULL,
     state approval_state DEFAULT 'PENDING',
     decision decision_type,
     note TEXT,
@@ -197,7 +197,7 @@ CREATE TABLE pm_tasks (
     last_completed TIMESTAMP WITH TIME ZONE,
     next_due TIMESTAMP WITH TIME ZONE,
     completion_count INTEGER DEFAULT 0,
-    created_by UUID REFERENCES users(id),
+    created_by UUID REFERENCES users(id) ON DELETE SET NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -209,8 +209,8 @@ CREATE TABLE pm_schedule (
     scheduled_date TIMESTAMP WITH TIME ZONE NOT NULL,
     due_date TIMESTAMP WITH TIME ZONE NOT NULL,
     status pm_task_status DEFAULT 'SCHEDULED',
-    assigned_to UUID REFERENCES users(id),
-    work_order_id UUID REFERENCES work_orders(id),
+    assigned_to UUID REFERENCES users(id) ON DELETE SET NULL,
+    work_order_id UUID REFERENCES work_orders(id) ON DELETE SET NULL,
     completion_date TIMESTAMP WITH TIME ZONE,
     completion_notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -224,7 +224,7 @@ CREATE TABLE meter_readings (
     meter_type VARCHAR(50) NOT NULL,
     reading DECIMAL(15,3) NOT NULL,
     reading_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    read_by UUID REFERENCES users(id),
+    read_by UUID REFERENCES users(id) ON DELETE SET NULL,
     notes TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
@@ -264,7 +264,7 @@ CREATE TABLE stock_movements (
     reference_type VARCHAR(50), -- 'WORK_ORDER', 'PURCHASE', 'ADJUSTMENT'
     reference_id UUID,
     notes TEXT,
-    created_by UUID REFERENCES users(id),
+    created_by UUID REFERENCES users(id) ON DELETE SET NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -285,7 +285,7 @@ CREATE TABLE documents (
     reference_id UUID,
     tags TEXT[],
     description TEXT,
-    uploaded_by UUID REFERENCES users(id),
+    uploaded_by UUID REFERENCES users(id) ON DELETE SET NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -312,36 +312,42 @@ CREATE TABLE sync_status (
 -- AUDIT & LOGGING
 -- =============================================================================
 
--- Audit Log table
+-- Audit Log table (monthly RANGE partitions on changed_at)
 CREATE TABLE audit_log (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     table_name VARCHAR(100) NOT NULL,
     record_id UUID NOT NULL,
     operation VARCHAR(20) NOT NULL,
     old_values JSONB,
     new_values JSONB,
-    changed_by UUID REFERENCES users(id),
-    changed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    client_info JSONB
-);
+    changed_by UUID,
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    client_info JSONB,
+    CONSTRAINT audit_log_pkey PRIMARY KEY (id, changed_at),
+    CONSTRAINT audit_log_changed_by_fkey FOREIGN KEY (changed_by) REFERENCES users(id) ON DELETE SET NULL
+) PARTITION BY RANGE (changed_at);
+
+CREATE TABLE audit_log_default PARTITION OF audit_log DEFAULT;
 
 -- =============================================================================
 -- INDEXES FOR PERFORMANCE
 -- =============================================================================
 
 -- Core entity indexes
-CREATE INDEX idx_assets_company_id ON assets(company_id);
+CREATE INDEX idx_assets_company_status ON assets(company_id, status);
 CREATE INDEX idx_assets_status ON assets(status);
 CREATE INDEX idx_assets_location ON assets(location);
 
 CREATE INDEX idx_work_orders_asset_id ON work_orders(asset_id);
 CREATE INDEX idx_work_orders_assigned_to ON work_orders(assigned_to);
+CREATE INDEX idx_wo_open_by_user ON work_orders(assigned_to, status)
+    WHERE status IN ('OPEN', 'IN_PROGRESS');
 CREATE INDEX idx_work_orders_status ON work_orders(status);
 CREATE INDEX idx_work_orders_priority ON work_orders(priority);
 CREATE INDEX idx_work_orders_created_at ON work_orders(created_at);
 
 -- Financial indexes
-CREATE INDEX idx_cost_entries_work_order_id ON cost_entries(work_order_id);
+CREATE INDEX idx_cost_entries_wo_type ON cost_entries(work_order_id, type);
 CREATE INDEX idx_cost_entries_type ON cost_entries(type);
 CREATE INDEX idx_cost_entries_created_at ON cost_entries(created_at);
 
@@ -354,6 +360,8 @@ CREATE INDEX idx_pm_schedule_pm_task_id ON pm_schedule(pm_task_id);
 CREATE INDEX idx_pm_schedule_assigned_to ON pm_schedule(assigned_to);
 CREATE INDEX idx_pm_schedule_status ON pm_schedule(status);
 CREATE INDEX idx_pm_schedule_due_date ON pm_schedule(due_date);
+CREATE INDEX idx_pm_schedule_due_open ON pm_schedule(due_date)
+    WHERE status IN ('SCHEDULED', 'DUE', 'OVERDUE');
 
 CREATE INDEX idx_meter_readings_asset_id ON meter_readings(asset_id);
 CREATE INDEX idx_meter_readings_reading_date ON meter_readings(reading_date);
@@ -363,6 +371,37 @@ CREATE INDEX idx_inventory_items_part_number ON inventory_items(part_number);
 CREATE INDEX idx_inventory_items_category ON inventory_items(category);
 CREATE INDEX idx_stock_movements_inventory_item_id ON stock_movements(inventory_item_id);
 
+-- Foreign key indexes (referential checks on parent deletes)
+CREATE INDEX idx_assets_parent_asset_id ON assets(parent_asset_id);
+CREATE INDEX idx_work_orders_created_by ON work_orders(created_by);
+CREATE INDEX idx_cost_entries_created_by ON cost_entries(created_by);
+CREATE INDEX idx_budgets_company_id ON budgets(company_id);
+CREATE INDEX idx_approvals_work_order_id ON approvals(work_order_id);
+CREATE INDEX idx_approvals_approver_id ON approvals(approver_id);
+CREATE INDEX idx_sla_templates_company_id ON sla_templates(company_id);
+CREATE INDEX idx_assignment_rules_company_id ON assignment_rules(company_id);
+CREATE INDEX idx_pm_tasks_created_by ON pm_tasks(created_by);
+CREATE INDEX idx_pm_schedule_work_order_id ON pm_schedule(work_order_id);
+CREATE INDEX idx_meter_readings_read_by ON meter_readings(read_by);
+CREATE INDEX idx_inventory_items_company_id ON inventory_items(company_id);
+CREATE INDEX idx_stock_movements_created_by ON stock_movements(created_by);
+CREATE INDEX idx_documents_uploaded_by ON documents(uploaded_by);
+CREATE INDEX idx_audit_log_changed_by ON audit_log(changed_by);
+
+-- Sync change feed indexes (keyset pagination by updated_at, id)
+CREATE INDEX idx_work_orders_updated_at_id ON work_orders(updated_at, id);
+CREATE INDEX idx_pm_tasks_updated_at_id ON pm_tasks(updated_at, id);
+CREATE INDEX idx_pm_schedule_updated_at_id ON pm_schedule(updated_at, id);
+
+-- JSONB containment indexes
+CREATE INDEX idx_wo_meta_gin ON work_orders USING gin(metadata);
+CREATE INDEX idx_audit_log_new_values_gin ON audit_log USING gin(new_values);
+CREATE INDEX idx_audit_log_table_date ON audit_log(table_name, changed_at);
+
+-- Tag array indexes (tags @> / && filters)
+CREATE INDEX idx_wo_tags_gin ON work_orders USING gin(tags);
+CREATE INDEX idx_docs_tags_gin ON documents USING gin(tags);
+
 -- Full-text search indexes
 CREATE INDEX idx_work_orders_fts ON work_orders USING gin(to_tsvector('english', title || ' ' || description));
 CREATE INDEX idx_assets_fts ON assets USING gin(to_tsvector('english', name || ' ' || COALESCE(description, '')));
@@ -380,6 +419,71 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Create monthly partitions from from_month (or the oldest month held by the
+-- default partition) through months_ahead months past the current month;
+-- returns how many were created. Rows of a month that already sit in the
+-- default partition are moved into the new partition before it is attached.
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(
+    from_month DATE DEFAULT CURRENT_DATE,
+    months_ahead INTEGER DEFAULT 2
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    from_month := LEAST(
+        from_month,
+        COALESCE((SELECT MIN(changed_at) FROM audit_log_default)::date, from_month)
+    );
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', from_month),
+            date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    LOOP
+        partition_name := format('audit_log_%s', to_char(month_start, 'YYYY_MM'));
+        month_end := (month_start + interval '1 month')::date;
+        CONTINUE WHEN to_regclass(partition_name) IS NOT NULL;
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM audit_log_default
+                WHERE changed_at >= month_start AND changed_at < month_end
+            ) THEN
+                -- Move the month out of the default partition, then attach
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE audit_log INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM audit_log_default
+                                    WHERE changed_at >= %L AND changed_at < %L RETURNING *)
+                     INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE audit_log ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_log FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'Could not create audit log partition %: %', partition_name, SQLERRM;
+        END;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_audit_log_partitions();
+
 -- Create triggers for updated_at
 CREATE TRIGGER update_users_updated_at BEFORE UPDATE ON users FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_companies_updated_at BEFORE UPDATE ON companies FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
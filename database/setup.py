@@ -8,6 +8,7 @@ import asyncio
 import asyncpg
 import os
 import sys
+from dataclasses import replace
 from pathlib import Path
 from typing import Optional
 import logging
@@ -29,17 +30,19 @@ class DatabaseSetup:
     """Database setup and initialization"""
     
     def __init__(self):
-        self.config = DatabaseConfig()
+        # Read after load_dotenv() so values from .env are picked up
+        self.config = DatabaseConfig.read_env()
         self.admin_config = self._get_admin_config()
     
     def _get_admin_config(self) -> DatabaseConfig:
         """Get admin configuration for initial setup"""
-        admin_config = DatabaseConfig()
         # Use postgres user for initial setup
-        admin_config.username = os.getenv('DB_ADMIN_USER', 'postgres')
-        admin_config.password = os.getenv('DB_ADMIN_PASSWORD', 'postgres')
-        admin_config.database = 'postgres'  # Connect to default database
-        return admin_config
+        return replace(
+            self.config,
+            username=os.getenv('DB_ADMIN_USER', 'postgres'),
+            password=os.getenv('DB_ADMIN_PASSWORD', 'postgres'),
+            database='postgres'  # Connect to default database
+        )
     
     async def create_database(self):
         """Create the application database if it doesn't exist"""